@@ -0,0 +1,41 @@
+# app/api/admission.py
+from typing import AsyncIterator, Callable
+
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+from app.services.admission import AdmissionRejected, admission_controller
+
+# Lecturas baratas (estado de jobs, descargas, health) no pasan por admisión
+EXEMPT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def admission(route: str) -> Callable[[Request], AsyncIterator[None]]:
+    """
+    Dependencia de FastAPI que reserva un lugar de la ruta mientras dura la request.
+
+    Si no hay lugar dentro del presupuesto de espera responde 503 con
+    Retry-After sin tocar el modelo. FastAPI lee los parámetros de body
+    (modelos Pydantic, File/Form) antes de correr las dependencias: para que
+    el rechazo llegue antes de recibir el body, los endpoints de estas rutas
+    lo leen ellos mismos desde Request (read_json_body / multipart en streaming).
+    """
+    async def dependency(request: Request) -> AsyncIterator[None]:
+        if not settings.ADMISSION_ENABLED or request.method in EXEMPT_METHODS:
+            yield
+            return
+        try:
+            await admission_controller.acquire(route)
+        except AdmissionRejected as e:
+            print(f"🚦 [ADMISSION] {route} rechazada ({e.reason}): {e}")
+            raise HTTPException(
+                status_code=503,
+                detail={"error": "Servicio saturado", "reason": e.reason, "message": str(e)},
+                headers={"Retry-After": str(int(round(e.retry_after)))},
+            )
+        try:
+            yield
+        finally:
+            admission_controller.release(route)
+
+    return dependency
@@ -1,27 +1,35 @@
 # app/api/endpoints/converter.py
 
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, UploadFile, HTTPException, Request
 from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
 import subprocess
-import os
-import uuid
-from pathlib import Path
 import shutil
-from typing import Optional
-import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from app.api.file_range import range_file_response
+from app.core.config import settings
+from app.services.conversion_jobs import QUALITY_PRESETS, ConversionJob, ConversionQueueFull, conversion_service
 
 router = APIRouter()
 
 # Directorio temporal
-TEMP_DIR = Path("/tmp/excel-to-pdf")
+TEMP_DIR = Path(settings.CONVERTER_TEMP_DIR)
 TEMP_DIR.mkdir(parents=True, exist_ok=True)
 
+EXCEL_EXTENSIONS = ('.xlsx', '.xls', '.xlsm')
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # Encabezados y separadores alrededor del archivo
+
 @router.get("/health")
 async def converter_health():
     """Verificar que LibreOffice está disponible"""
     try:
         result = subprocess.run(
-            ["libreoffice", "--version"],
+            [settings.LIBREOFFICE_BIN, "--version"],
             capture_output=True,
             text=True,
             timeout=5
@@ -29,7 +37,9 @@ async def converter_health():
         return {
             "status": "healthy",
             "libreoffice": result.stdout.strip(),
-            "service": "Excel to PDF Converter"
+            "service": "Excel to PDF Converter",
+            "quality_presets": list(QUALITY_PRESETS),
+            "jobs": conversion_service.stats()
         }
     except FileNotFoundError:
         return {
@@ -44,31 +54,66 @@ async def converter_health():
             "service": "Excel to PDF Converter"
         }
 
-@router.post("/excel-to-pdf")
-async def convert_excel_to_pdf(
-    file: UploadFile = File(...),
-    quality: Optional[str] = "normal"
-):
+async def _limited_stream(request: Request, max_bytes: int) -> AsyncIterator[bytes]:
+    """Body de la request cortado con 413 apenas supera max_bytes (sin esperar al final)"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Archivo demasiado grande: más de {settings.CONVERTER_MAX_UPLOAD_BYTES} bytes"
+        )
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Archivo demasiado grande: más de {settings.CONVERTER_MAX_UPLOAD_BYTES} bytes"
+            )
+        yield chunk
+
+
+@asynccontextmanager
+async def _uploaded_file(request: Request) -> AsyncIterator[UploadFile]:
     """
-    Convierte un archivo Excel a PDF usando LibreOffice
-    
-    Args:
-        file: Archivo Excel (.xlsx, .xls, .xlsm)
-        quality: Calidad del PDF (normal, high) - opcional
-        
-    Returns:
-        Archivo PDF descargable
+    Lee el multipart dentro del endpoint, después de la admisión.
+
+    Si el archivo fuera un parámetro (File(...)) FastAPI recibiría el upload
+    completo antes de correr la dependencia de admisión y el límite de tamaño.
     """
-    
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=400, detail="Se espera multipart/form-data con el campo 'file'")
+    parser = MultiPartParser(
+        request.headers,
+        _limited_stream(request, settings.CONVERTER_MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES),
+        max_files=1,
+        max_fields=10,
+    )
+    try:
+        form = await parser.parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+    try:
+        file = form.get("file")
+        if not isinstance(file, StarletteUploadFile):
+            raise HTTPException(status_code=422, detail="Falta el archivo (campo 'file')")
+        yield file
+    finally:
+        await form.close()
+
+
+async def _create_job_from_upload(file: UploadFile, quality: str, timeout: Optional[float]) -> ConversionJob:
+    """Valida el archivo, registra el job y guarda el Excel en disco por partes"""
     print(f"\n{'='*60}")
     print(f"📊 [CONVERTER] Nueva solicitud de conversión")
     print(f"   Archivo: {file.filename}")
     print(f"   Tamaño: {file.size if hasattr(file, 'size') else 'unknown'} bytes")
     print(f"   Tipo: {file.content_type}")
+    print(f"   Calidad: {quality}")
     print(f"{'='*60}")
     
     # Validar extensión
-    if not file.filename.endswith(('.xlsx', '.xls', '.xlsm')):
+    if not file.filename or not file.filename.lower().endswith(EXCEL_EXTENSIONS):
         raise HTTPException(
             status_code=400,
             detail={
@@ -78,135 +123,166 @@ async def convert_excel_to_pdf(
             }
         )
     
-    # Generar ID único
-    conversion_id = str(uuid.uuid4())
+    try:
+        job = conversion_service.create_job(file.filename, quality=quality, timeout=timeout)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "Calidad no válida", "message": str(e)}
+        )
     
-    # Paths temporales
-    input_path = TEMP_DIR / f"{conversion_id}.xlsx"
-    output_dir = TEMP_DIR / conversion_id
-    output_dir.mkdir(parents=True, exist_ok=True)
+    # Guardar archivo Excel sin cargarlo completo en memoria
+    input_path = conversion_service.input_path(job)
+    size = 0
+    with open(input_path, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > settings.CONVERTER_MAX_UPLOAD_BYTES:
+                job.status, job.error = "failed", "Archivo demasiado grande"
+                conversion_service.delete(job.id)
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Archivo demasiado grande: más de {settings.CONVERTER_MAX_UPLOAD_BYTES} bytes"
+                )
+            buffer.write(chunk)
     
+    print(f"✅ [CONVERTER] Excel guardado: {input_path} ({size:,} bytes)")
+    return job
+
+
+def _submit_or_503(job: ConversionJob):
+    """Envía el job al pool; si ya hay demasiadas conversiones responde 503"""
     try:
-        # 1. Guardar archivo Excel
-        print(f"💾 [CONVERTER] Guardando Excel temporal...")
-        content = await file.read()
-        
-        with open(input_path, "wb") as buffer:
-            buffer.write(content)
-        
-        print(f"✅ [CONVERTER] Excel guardado: {input_path} ({len(content):,} bytes)")
-        
-        # 2. Comando LibreOffice
-        command = [
-            "libreoffice",
-            "--headless",
-            "--invisible",
-            "--nocrashreport",
-            "--nodefault",
-            "--nofirststartwizard",
-            "--nolockcheck",
-            "--nologo",
-            "--norestore",
-            "--convert-to", "pdf",
-            "--outdir", str(output_dir),
-            str(input_path)
-        ]
-        
-        print(f"🔧 [CONVERTER] Iniciando conversión con LibreOffice...")
-        
-        # 3. Ejecutar conversión
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        
-        if result.returncode != 0:
-            print(f"❌ [CONVERTER] Error en LibreOffice:")
-            print(f"   stdout: {result.stdout}")
-            print(f"   stderr: {result.stderr}")
-            raise HTTPException(
-                status_code=500,
-                detail={
-                    "error": "Error en conversión",
-                    "message": result.stderr or "Error desconocido de LibreOffice",
-                    "stdout": result.stdout
-                }
-            )
-        
-        print(f"✅ [CONVERTER] Conversión completada")
-        
-        # 4. Buscar PDF generado
-        pdf_files = list(output_dir.glob("*.pdf"))
-        
-        if not pdf_files:
-            print(f"❌ [CONVERTER] No se encontró PDF generado")
-            print(f"   Archivos en directorio: {list(output_dir.iterdir())}")
-            raise HTTPException(
-                status_code=500,
-                detail={
-                    "error": "PDF no generado",
-                    "message": "LibreOffice no generó el archivo PDF esperado"
-                }
-            )
-        
-        pdf_path = pdf_files[0]
-        pdf_size = pdf_path.stat().st_size
-        
-        print(f"✅ [CONVERTER] PDF encontrado: {pdf_path.name} ({pdf_size:,} bytes)")
-        
-        # 5. Generar nombre de salida
-        output_filename = f"{Path(file.filename).stem}.pdf"
-        
-        print(f"📤 [CONVERTER] Enviando PDF al cliente: {output_filename}")
-        print(f"{'='*60}\n")
-        
-        # 6. Retornar archivo
-        return FileResponse(
-            path=pdf_path,
-            media_type="application/pdf",
-            filename=output_filename,
-            background=None
+        return conversion_service.submit(job)
+    except ConversionQueueFull as e:
+        job.status, job.error = "failed", str(e)
+        conversion_service.delete(job.id)
+        print(f"🚦 [CONVERTER] Job rechazado: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "Servicio saturado", "reason": "queue_full", "message": str(e)},
+            headers={"Retry-After": str(max(1, int(round(settings.ADMISSION_CONVERTER_QUEUE_MS / 1000))))},
         )
+
+
+def _job_response(request: Request, job: ConversionJob) -> dict:
+    data = job.to_dict()
+    data["status_url"] = str(request.url_for("conversion_job_status", job_id=job.id))
+    if job.status == "done":
+        data["download_url"] = str(request.url_for("conversion_job_download", job_id=job.id))
+    return data
+
+
+def _get_job_or_404(job_id: str) -> ConversionJob:
+    job = conversion_service.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job no encontrado: {job_id}")
+    return job
+
+
+@router.post("/excel-to-pdf")
+async def convert_excel_to_pdf(
+    request: Request,
+    quality: Optional[str] = "normal",
+    timeout: Optional[float] = None
+):
+    """
+    Convierte un archivo Excel a PDF usando LibreOffice (espera el resultado)
+    
+    Args:
+        file: Archivo Excel (.xlsx, .xls, .xlsm)
+        quality: Calidad del PDF (draft, normal, high) - opcional
+        timeout: Segundos máximos de conversión - opcional
         
-    except subprocess.TimeoutExpired:
-        print(f"❌ [CONVERTER] Timeout en conversión (>30s)")
+    Returns:
+        Archivo PDF descargable
+    
+    Para libros grandes usar POST /jobs y descargar el resultado después.
+    """
+    async with _uploaded_file(request) as file:
+        job = await _create_job_from_upload(file, quality, timeout)
+    job = await _submit_or_503(job)
+    
+    if job.status == "timeout":
+        conversion_service.delete(job.id)
         raise HTTPException(
             status_code=500,
             detail={
                 "error": "Timeout",
-                "message": "La conversión tardó demasiado tiempo (>30 segundos)"
+                "message": f"{job.error}. Usar /converter/jobs para conversiones largas"
             }
         )
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"❌ [CONVERTER] Error inesperado: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    if job.status != "done":
+        conversion_service.delete(job.id)
         raise HTTPException(
             status_code=500,
             detail={
-                "error": "Error interno",
-                "message": str(e)
+                "error": "Error en conversión",
+                "message": job.error
             }
         )
-    finally:
-        # 7. Limpiar archivos temporales (con delay para permitir descarga)
-        async def cleanup():
-            await asyncio.sleep(2)  # Esperar 2 segundos
-            try:
-                if input_path.exists():
-                    input_path.unlink()
-                if output_dir.exists():
-                    shutil.rmtree(output_dir, ignore_errors=True)
-                print(f"🧹 [CONVERTER] Archivos temporales limpiados: {conversion_id}")
-            except Exception as e:
-                print(f"⚠️  [CONVERTER] Error al limpiar: {e}")
-        
-        # Ejecutar limpieza en background
-        asyncio.create_task(cleanup())
+    
+    print(f"📤 [CONVERTER] Enviando PDF al cliente: {job.output_filename}")
+    print(f"{'='*60}\n")
+    
+    # Retornar archivo y limpiar el job una vez enviado
+    return FileResponse(
+        path=conversion_service.pdf_path(job),
+        media_type="application/pdf",
+        filename=job.output_filename,
+        background=BackgroundTask(conversion_service.delete, job.id)
+    )
+
+@router.post("/jobs", status_code=202)
+async def create_conversion_job(
+    request: Request,
+    quality: Optional[str] = "normal",
+    timeout: Optional[float] = None
+):
+    """
+    Encola una conversión Excel → PDF y retorna el id del job de inmediato
+    
+    El estado se consulta en GET /jobs/{job_id} y el PDF se descarga (con
+    soporte de Range) en GET /jobs/{job_id}/download.
+    """
+    async with _uploaded_file(request) as file:
+        job = await _create_job_from_upload(file, quality, timeout)
+    _submit_or_503(job)
+    print(f"📨 [CONVERTER] Job encolado: {job.id}")
+    return _job_response(request, job)
+
+@router.get("/jobs/{job_id}", name="conversion_job_status")
+async def get_conversion_job(request: Request, job_id: str):
+    """Estado de un job de conversión"""
+    return _job_response(request, _get_job_or_404(job_id))
+
+@router.get("/jobs/{job_id}/download", name="conversion_job_download")
+async def download_conversion_job(request: Request, job_id: str):
+    """Descarga el PDF de un job terminado (admite Range / If-Range para reanudar)"""
+    job = _get_job_or_404(job_id)
+    if job.status in ("queued", "running"):
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "Conversión en curso", "status": job.status},
+            headers={"Retry-After": "2"}
+        )
+    pdf_path = conversion_service.pdf_path(job)
+    if job.status != "done" or pdf_path is None or not pdf_path.exists():
+        raise HTTPException(
+            status_code=410,
+            detail={"error": "PDF no disponible", "status": job.status, "message": job.error}
+        )
+    return range_file_response(request, pdf_path, "application/pdf", job.output_filename)
+
+@router.delete("/jobs/{job_id}")
+async def delete_conversion_job(job_id: str):
+    """Elimina un job terminado y su PDF"""
+    _get_job_or_404(job_id)
+    try:
+        conversion_service.delete(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "success", "deleted": job_id}
 
 @router.delete("/cleanup")
 async def cleanup_old_files(hours: int = 1):
@@ -230,6 +306,9 @@ async def cleanup_old_files(hours: int = 1):
                     shutil.rmtree(item, ignore_errors=True)
                 deleted += 1
         
+        # Jobs terminados con la misma antigüedad
+        deleted += conversion_service.purge(hours * 3600)
+        
         print(f"✅ [CONVERTER] Limpieza completada: {deleted} items eliminados")
         
         return {
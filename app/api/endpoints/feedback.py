@@ -1,37 +1,40 @@
 # app/api/endpoints/feedback.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from app.api.json_body import parse_json_model
+from app.core.config import settings
 from app.schemas.recommendation import FeedbackRequest
-from app.services.ml_service import ml_service
-import json
+from app.services.ml_service import get_ml_service
 from datetime import datetime
-from pathlib import Path
+from functools import partial
+from pydantic import ValidationError
+from typing import Optional
 
 router = APIRouter()
 
-FEEDBACK_FILE = Path("./data/feedback.jsonl")
-FEEDBACK_FILE.parent.mkdir(exist_ok=True)
-
 @router.post("/")
-async def receive_feedback(feedback: FeedbackRequest):
+async def receive_feedback(request: Request):
     """Recibe feedback de acciones tomadas"""
+    # El body se lee acá (después de la admisión), no como parámetro del endpoint
+    try:
+        feedback = await parse_json_model(request, FeedbackRequest, settings.MAX_FEEDBACK_BODY_BYTES)
+    except ValidationError as ve:
+        raise HTTPException(status_code=422, detail=ve.errors())
+
     print("\n======== [ML FEEDBACK] Recibido ========")
     print(f"Acción: {feedback.accion_seleccionada}")
     print(f"¿Fue ML?: {feedback.fue_recomendacion_ml}")
     print(f"Tipo: {feedback.feedback_type}")
     print(f"Score: {feedback.feedback_score}")
     
-    # Guardar feedback en archivo JSONL
+    # Guardar feedback en el backend configurado (jsonl | sqlite)
     feedback_entry = {
         **feedback.dict(),
         "timestamp": datetime.now().isoformat()
     }
     
-    with open(FEEDBACK_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(feedback_entry, ensure_ascii=False) + "\n")
-    
-    # Contar feedbacks pendientes
-    feedback_count = sum(1 for _ in open(FEEDBACK_FILE))
+    # Se encola en memoria; el lote se escribe a disco en background
+    feedback_count = await get_ml_service().feedback_buffer.put(feedback_entry)
     
     print(f"📊 Total feedbacks acumulados: {feedback_count}")
     
@@ -45,4 +48,79 @@ async def receive_feedback(feedback: FeedbackRequest):
         "status": "feedback_received",
         "pending_count": feedback_count,
         "message": "Feedback guardado exitosamente"
-    }
\ No newline at end of file
+    }
+
+def _history_filters(
+    since: Optional[str],
+    question_text: Optional[str],
+    feedback_type: Optional[str],
+    fue_recomendacion_ml: Optional[bool],
+    score_above: Optional[float],
+) -> dict:
+    filters = {
+        "since": since,
+        "question_text": question_text,
+        "feedback_type": feedback_type,
+        "fue_recomendacion_ml": fue_recomendacion_ml,
+        "score_above": score_above,
+    }
+    return {key: value for key, value in filters.items() if value is not None}
+
+@router.get("/history")
+async def feedback_history(
+    since: Optional[str] = None,
+    question_text: Optional[str] = None,
+    feedback_type: Optional[str] = None,
+    fue_recomendacion_ml: Optional[bool] = None,
+    score_above: Optional[float] = None,
+    limit: int = 100,
+):
+    """Historial de feedback filtrado (más antiguos primero)"""
+    filters = _history_filters(since, question_text, feedback_type, fue_recomendacion_ml, score_above)
+    ml_service = get_ml_service()
+    result = await ml_service.executor.run_blocking(
+        partial(ml_service.feedback_history, limit=max(limit, 0), **filters)
+    )
+    return {
+        "status": "success",
+        "count": len(result["feedbacks"]),
+        **result
+    }
+
+@router.get("/stats")
+async def feedback_stats(
+    group_by: str = "feedback_type",
+    since: Optional[str] = None,
+    question_text: Optional[str] = None,
+    feedback_type: Optional[str] = None,
+    fue_recomendacion_ml: Optional[bool] = None,
+    score_above: Optional[float] = None,
+):
+    """Cantidad y score promedio del feedback, agrupados por una columna"""
+    filters = _history_filters(since, question_text, feedback_type, fue_recomendacion_ml, score_above)
+    ml_service = get_ml_service()
+    try:
+        result = await ml_service.executor.run_blocking(
+            partial(ml_service.feedback_stats, group_by, **filters)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "status": "success",
+        **result
+    }
+
+@router.post("/compact")
+async def compact_feedback():
+    """Compacta el feedback acumulado en formato listo para re-entrenar"""
+    print("\n======== [ML FEEDBACK] Compactación ========")
+    try:
+        ml_service = get_ml_service()
+        result = await ml_service.executor.run_blocking(ml_service.compact_feedback)
+        return {
+            "status": "success",
+            **result
+        }
+    except Exception as e:
+        print(f"❌ Error compactando feedback: {e}")
+        raise HTTPException(status_code=500, detail=f"Error compactando feedback: {str(e)}")
\ No newline at end of file
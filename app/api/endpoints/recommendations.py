@@ -1,6 +1,10 @@
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from app.api.json_body import parse_json_model
+from app.core.config import settings
 from app.schemas.recommendation import RecommendationRequest
-from app.services.ml_service import ml_service
+from app.services.ml_service import get_ml_service
+from app.services.inference_executor import InferenceQueueFull
 from pydantic import ValidationError
 
 router = APIRouter()
@@ -9,17 +13,21 @@ router = APIRouter()
 async def get_recommendation(request: Request):
     """Genera recomendación para una observación"""
     print("\n======== [ML RECOMMEND] Request recibido ========")
-    print(f"Headers: {dict(request.headers)}")
-    raw_body = await request.body()
-    print(f"Tamaño de body (bytes): {len(raw_body)}")
 
     try:
-        json_body = await request.json()
-        print(f"Keys principales del body: {list(json_body.keys())}")
-        payload = RecommendationRequest(**json_body)
-        result = ml_service.get_recommendation(payload)
+        payload = await parse_json_model(
+            request, RecommendationRequest, settings.MAX_RECOMMEND_BODY_BYTES
+        )
+        recommendation = await get_ml_service().get_recommendation_async(payload)
         print("======== [ML RECOMMEND] Recomendación exitosa ========")
-        return result
+        # Body pre-serializado: solo se inserta la confianza
+        return Response(content=recommendation.response_body(), media_type="application/json")
+    except HTTPException:
+        raise
+    except InferenceQueueFull as e:
+        print("======== [ML RECOMMEND] Cola de inferencia llena ========")
+        print(str(e))
+        raise HTTPException(status_code=503, detail=str(e))
     except ValidationError as ve:
         print("======== [ML RECOMMEND] Error de validación ========")
         print(str(ve))
@@ -31,4 +39,4 @@ async def get_recommendation(request: Request):
     except Exception as e:
         print("======== [ML RECOMMEND] Error general ========")
         print(str(e))
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
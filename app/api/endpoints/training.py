@@ -1,31 +1,30 @@
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+from app.api.json_body import parse_json_model
+from app.core.config import settings
 from app.schemas.recommendation import TrainingRequest
-from app.services.ml_service import ml_service
+from app.services.ml_service import get_ml_service
 from pydantic import ValidationError
 
 router = APIRouter()
 
-@router.post("/")
+@router.post("/", response_class=ORJSONResponse)
 async def train_model(request: Request):
     """Entrena el modelo ML"""
-    # Logging inicial del request
     print("\n======== [ML TRAIN] Request recibido ========")
-    print(f"Headers: {dict(request.headers)}")
-    raw_body = await request.body()
-    print(f"Tamaño de body (bytes): {len(raw_body)}")
 
     try:
-        json_body = await request.json()
-        print(f"Keys principales del body: {list(json_body.keys())}")
-        if "instances" in json_body and json_body["instances"]:
-            print(f"Cantidad de instancias: {len(json_body['instances'])}")
-            print("Primera instancia keys:", list(json_body['instances'][0].keys()))
-            print("Primera instancia status:", json_body['instances'][0].get("status"))
-        # Validación con Pydantic
-        payload = TrainingRequest(**json_body)
-        result = ml_service.train_model(payload)
+        # Una sola decodificación (orjson) + validación Pydantic
+        payload = await parse_json_model(request, TrainingRequest, settings.MAX_TRAIN_BODY_BYTES)
+        print(f"Cantidad de instancias: {len(payload.instances)}")
+        if payload.instances:
+            print("Primera instancia status:", payload.instances[0].get("status"))
+        ml_service = get_ml_service()
+        result = await ml_service.executor.run_blocking(ml_service.train_model, payload)
         print("======== [ML TRAIN] Entrenamiento exitoso ========")
-        return result
+        return ORJSONResponse(result)
+    except HTTPException:
+        raise
     except ValidationError as ve:
         print("======== [ML TRAIN] Error de validación ========")
         print(str(ve))
@@ -37,4 +36,31 @@ async def train_model(request: Request):
     except Exception as e:
         print("======== [ML TRAIN] Error general ========")
         print(str(e))
-        raise HTTPException(status_code=500, detail=f"Error entrenando: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error entrenando: {str(e)}")
+
+
+@router.get("/shadow", response_class=ORJSONResponse)
+async def shadow_status():
+    """Estado de la evaluación en sombra del modelo candidato"""
+    return ORJSONResponse(get_ml_service().shadow.stats())
+
+@router.post("/shadow/promote", response_class=ORJSONResponse)
+async def promote_shadow(force: bool = False):
+    """Promueve el modelo candidato a activo si cumple los umbrales (force=true los ignora)"""
+    print("\n======== [ML SHADOW] Promoción solicitada ========")
+    try:
+        ml_service = get_ml_service()
+        result = await ml_service.executor.run_blocking(ml_service.promote_shadow, force)
+        if result['status'] == 'rejected':
+            return ORJSONResponse(result, status_code=409)
+        return ORJSONResponse(result)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        print(f"❌ Error promoviendo modelo: {e}")
+        raise HTTPException(status_code=500, detail=f"Error promoviendo modelo: {str(e)}")
+
+@router.delete("/shadow", response_class=ORJSONResponse)
+async def discard_shadow():
+    """Descarta el modelo candidato en evaluación"""
+    return ORJSONResponse(get_ml_service().discard_shadow())
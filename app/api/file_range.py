@@ -0,0 +1,83 @@
+# app/api/file_range.py
+import os
+import re
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
+
+CHUNK_SIZE = 256 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Rango (inicio, fin inclusive) de un header Range de un solo tramo"""
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None  # Sintaxis no soportada (p. ej. multi-rango): se envía completo
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Sufijo: los últimos N bytes
+        length = int(last)
+        if length == 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None  # Rango inválido (fin < inicio): RFC 7233 manda ignorarlo y enviar completo
+    if start >= size:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def _iter_file(path: Path, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def range_file_response(request: Request, path: Path, media_type: str, filename: str):
+    """
+    Sirve un archivo con soporte de descargas reanudables.
+
+    Responde 206 con Content-Range para un header Range de un tramo, 416 si el
+    rango es válido pero no satisfacible (empieza después del final) y el
+    archivo completo (200) en cualquier otro caso: rango inválido o con otra
+    sintaxis, o If-Range que no coincide con el ETag actual.
+    """
+    stat = os.stat(path)
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}",
+    }
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    byte_range = None
+    if range_header and (if_range is None or if_range == etag):
+        byte_range = _parse_range(range_header, stat.st_size)
+
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
+
+    start, end = byte_range
+    headers.update({
+        "Content-Range": f"bytes {start}-{end}/{stat.st_size}",
+        "Content-Length": str(end - start + 1),
+    })
+    return StreamingResponse(
+        _iter_file(path, start, end), status_code=206, media_type=media_type, headers=headers
+    )
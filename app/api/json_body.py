@@ -0,0 +1,45 @@
+# app/api/json_body.py
+from typing import Any, Type, TypeVar
+
+import orjson
+from fastapi import HTTPException, Request
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+async def read_json_body(request: Request, max_bytes: int) -> Any:
+    """
+    Lee y decodifica el body JSON una sola vez con orjson.
+
+    El límite de tamaño se aplica mientras se recibe el stream, de modo que un
+    payload demasiado grande se rechaza (413) sin cargarlo completo en memoria.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Payload demasiado grande: {content_length} bytes (máximo {max_bytes})"
+        )
+
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Payload demasiado grande: más de {max_bytes} bytes"
+            )
+        chunks.append(chunk)
+
+    try:
+        return orjson.loads(b"".join(chunks))
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"JSON inválido: {e}")
+
+
+async def parse_json_model(request: Request, model: Type[ModelT], max_bytes: int) -> ModelT:
+    """Decodifica el body y lo valida directamente contra el modelo Pydantic"""
+    data = await read_json_body(request, max_bytes)
+    return model.model_validate(data)
@@ -1,11 +1,43 @@
-from fastapi import APIRouter
+from typing import Iterable
 
-from app.api.endpoints import training, recommendations, feedback, converter
+from fastapi import APIRouter, Depends
 
-router = APIRouter()
+from app.api.admission import admission
 
-# Ahora sí con prefix correcto
-router.include_router(training.router, prefix="/train", tags=["training"])
-router.include_router(recommendations.router, prefix="/recommend", tags=["recommendations"])
-router.include_router(feedback.router, prefix="/feedback", tags=["feedback"])
-router.include_router(converter.router, prefix="/converter", tags=["converter"])
\ No newline at end of file
+
+def create_api_router(components: Iterable[str]) -> APIRouter:
+    """
+    Router con los endpoints de los componentes pedidos.
+
+    Los módulos de endpoints se importan acá y no al importar el paquete: un
+    despliegue solo de converter no carga pandas, scikit-learn ni los modelos.
+    """
+    components = set(components)
+    router = APIRouter()
+
+    if "ml" in components:
+        from app.api.endpoints import training, recommendations, feedback
+
+        # Ahora sí con prefix correcto
+        router.include_router(
+            training.router, prefix="/train", tags=["training"],
+            dependencies=[Depends(admission("train"))]
+        )
+        router.include_router(
+            recommendations.router, prefix="/recommend", tags=["recommendations"],
+            dependencies=[Depends(admission("recommend"))]
+        )
+        router.include_router(
+            feedback.router, prefix="/feedback", tags=["feedback"],
+            dependencies=[Depends(admission("feedback"))]
+        )
+
+    if "converter" in components:
+        from app.api.endpoints import converter
+
+        router.include_router(
+            converter.router, prefix="/converter", tags=["converter"],
+            dependencies=[Depends(admission("converter"))]
+        )
+
+    return router
@@ -3,18 +3,116 @@ from pydantic_settings import BaseSettings
 from typing import List
 import os
 
+APP_COMPONENT_NAMES = ("ml", "converter")
+
+
+def parse_components(value: str) -> List[str]:
+    """Normaliza APP_COMPONENTS ("all", "ml", "converter", "ml,converter")"""
+    names = [name.strip().lower() for name in value.split(",") if name.strip()]
+    if not names or "all" in names:
+        return list(APP_COMPONENT_NAMES)
+    unknown = [name for name in names if name not in APP_COMPONENT_NAMES]
+    if unknown:
+        raise ValueError(f"APP_COMPONENTS inválido: {unknown} (opciones: all, {', '.join(APP_COMPONENT_NAMES)})")
+    return [name for name in APP_COMPONENT_NAMES if name in names]
+
 class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     # 🔥 Railway usa PORT como variable de entorno
     PORT: int = int(os.getenv("PORT", "8000"))
     ENVIRONMENT: str = "development"
+    # 🧱 Componentes a desplegar: all | ml | converter (o lista separada por comas)
+    APP_COMPONENTS: str = "all"
     
     # ✅ Orígenes por defecto más permisivos
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:4200,http://localhost:3002"
     
     MODEL_PATH: str = "./models"
     LOG_LEVEL: str = "INFO"
-    
+
+    # 🌲 Bosque aleatorio
+    FOREST_N_ESTIMATORS: int = 20
+    FOREST_MAX_DEPTH: int = 5
+    FOREST_COMPACTION: bool = True  # Poda + arreglos float32/int16 después de entrenar
+    FOREST_DISTILL_ESTIMATORS: int = 0  # > 0: destilar a un bosque con esa cantidad de árboles
+
+    # 🎯 Calibración de la confianza (se ajusta al entrenar)
+    CALIBRATION_METHOD: str = "auto"  # auto | isotonic | sigmoid | none
+    CALIBRATION_CV: int = 5  # Folds para las probabilidades out-of-fold
+
+    # 🗃️ Cache persistente de texto analizado para TF-IDF (entre re-entrenamientos)
+    FEATURE_CACHE_ENABLED: bool = True
+    FEATURE_CACHE_PATH: str = "./data/feature_cache.db"
+    FEATURE_CACHE_MAX_ENTRIES: int = 500_000
+
+    # 🧩 Modelos por plantilla
+    MODEL_POOL_MAX_RESIDENT: int = 8
+    MODEL_POOL_TRAIN_WORKERS: int = 2
+
+    # 🕶️ Evaluación en sombra de modelos candidatos
+    SHADOW_MODE: bool = False  # True: los re-entrenamientos globales quedan como candidatos
+    SHADOW_SAMPLE_RATE: float = 0.1
+    SHADOW_MIN_SAMPLES: int = 200
+    SHADOW_MIN_AGREEMENT: float = 0.8
+    SHADOW_MAX_LATENCY_RATIO: float = 1.5  # p95 candidato / p95 activo
+    SHADOW_MAX_PENDING: int = 64  # Por encima se descartan muestras
+
+    # ⚙️ Executor de inferencia (fuera del event loop)
+    INFERENCE_EXECUTOR: str = "thread"  # thread | process
+    INFERENCE_WORKERS: int = 2
+    INFERENCE_BATCH_WINDOW_MS: float = 5.0
+    INFERENCE_MAX_BATCH_SIZE: int = 32
+    INFERENCE_MAX_QUEUE: int = 256
+    BLOCKING_WORKERS: int = 2  # Entrenamiento y otras tareas pesadas
+
+    # 🚦 Control de admisión (concurrencia por ruta, prioridad y carga del sistema)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_CONCURRENT: int = 128  # Total de requests en curso (todas las rutas)
+    ADMISSION_INTERACTIVE_RESERVE: int = 16  # Lugares que train/converter no pueden ocupar
+    ADMISSION_MAX_WAITING: int = 256  # Más en espera → 503 inmediato
+    ADMISSION_RECOMMEND_CONCURRENCY: int = 64
+    ADMISSION_RECOMMEND_QUEUE_MS: float = 500.0
+    ADMISSION_FEEDBACK_CONCURRENCY: int = 32
+    ADMISSION_FEEDBACK_QUEUE_MS: float = 1000.0
+    ADMISSION_TRAIN_CONCURRENCY: int = 1
+    ADMISSION_TRAIN_QUEUE_MS: float = 2000.0
+    ADMISSION_CONVERTER_CONCURRENCY: int = 4
+    ADMISSION_CONVERTER_QUEUE_MS: float = 5000.0
+    ADMISSION_CPU_THRESHOLD: float = 0.9  # Fracción de CPU disponible en uso
+    ADMISSION_MEMORY_THRESHOLD: float = 0.9  # Fracción de memoria en uso
+
+    # 📦 Límites de tamaño de body (bytes)
+    MAX_RECOMMEND_BODY_BYTES: int = 64 * 1024
+    MAX_TRAIN_BODY_BYTES: int = 50 * 1024 * 1024
+    MAX_FEEDBACK_BODY_BYTES: int = 64 * 1024
+
+    # 💬 Feedback
+    FEEDBACK_BACKEND: str = "jsonl"  # jsonl | sqlite
+    FEEDBACK_FILE: str = "./data/feedback.jsonl"
+    FEEDBACK_DB_PATH: str = "./data/feedback.db"
+    FEEDBACK_FLUSH_BATCH_SIZE: int = 100
+    FEEDBACK_FLUSH_INTERVAL_MS: float = 500.0
+    FEEDBACK_MAX_PENDING: int = 10000
+    FEEDBACK_FSYNC: str = "periodic"  # always | periodic | never
+    FEEDBACK_FSYNC_INTERVAL_S: float = 5.0
+    FEEDBACK_COMPACT_PATH: str = "./data/feedback_training.npz"
+    FEEDBACK_CHECKPOINT_PATH: str = "./data/feedback_checkpoint.json"
+    FEEDBACK_SEGMENTS_DIR: str = "./data/segments"
+    FEEDBACK_MAX_PARTS: int = 16  # Más partes compactas → se fusionan en una sola
+    FEEDBACK_RETENTION_DAYS: int = 90  # Segmentos rotados y filas SQLite ya compactadas más viejas se eliminan
+    FEEDBACK_ROTATE: bool = True  # Solo JSONL: SQLite conserva el historial para consultas
+
+    # 📊 Conversor Excel → PDF
+    LIBREOFFICE_BIN: str = "libreoffice"
+    CONVERTER_TEMP_DIR: str = "/tmp/excel-to-pdf"
+    CONVERTER_JOBS_DIR: str = "/tmp/excel-to-pdf-jobs"
+    CONVERTER_WORKERS: int = 2
+    CONVERTER_TIMEOUT_S: float = 30.0  # Por defecto por job
+    CONVERTER_MAX_TIMEOUT_S: float = 600.0  # Tope para el timeout pedido por el cliente
+    CONVERTER_MAX_UPLOAD_BYTES: int = 50 * 1024 * 1024
+    CONVERTER_RESULT_TTL_S: int = 3600  # Resultados de jobs disponibles para descarga
+    CONVERTER_PURGE_INTERVAL_S: float = 300.0  # Cada cuánto se eliminan los jobs expirados
+
     @property
     def origins_list(self) -> List[str]:
         """Construye la lista de orígenes permitidos"""
@@ -41,6 +139,11 @@ class Settings(BaseSettings):
         
         return origins
     
+    @property
+    def components(self) -> List[str]:
+        """Componentes habilitados (ml, converter)"""
+        return parse_components(self.APP_COMPONENTS)
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
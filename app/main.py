@@ -2,72 +2,123 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from app.core.config import settings
-from app.api.routes import router as api_router
-from app.services.ml_service import ml_service
+from typing import Iterable, List, Optional
+from app.core.config import settings, parse_components
+from app.api.routes import create_api_router
+from app.services.admission import admission_controller
 import os
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Manejo de eventos de inicio y cierre de la aplicación"""
-    # Startup
-    print("=" * 50)
-    print("🚀 ML Service iniciando...")
-    print(f"📍 Environment: {settings.ENVIRONMENT}")
-    print(f"📍 Port: {settings.PORT}")
-    print(f"📍 Host: {settings.HOST}")
-    print(f"📍 Model Path: {settings.MODEL_PATH}")
-    print(f"🔍 CORS Origins: {settings.origins_list}")  # ← Ver qué orígenes permite
-    
-    # Verificar modelo cargado
-    health = ml_service.check_health()
-    if health.get('trained'):
-        print(f"✅ Modelo pre-entrenado cargado: {health.get('model_info', {}).get('filename', 'N/A')}")
+def _build_lifespan(components: List[str]):
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        """Manejo de eventos de inicio y cierre de la aplicación"""
+        # Startup
+        print("=" * 50)
+        print("🚀 ML Service iniciando...")
+        print(f"📍 Environment: {settings.ENVIRONMENT}")
+        print(f"📍 Port: {settings.PORT}")
+        print(f"📍 Host: {settings.HOST}")
+        print(f"📍 Model Path: {settings.MODEL_PATH}")
+        print(f"🧱 Componentes: {', '.join(components)}")
+        print(f"🔍 CORS Origins: {settings.origins_list}")  # ← Ver qué orígenes permite
+
+        ml_service = None
+        if "ml" in components:
+            from app.services.ml_service import get_ml_service
+            ml_service = get_ml_service()
+
+            # Verificar modelo cargado
+            health = ml_service.check_health()
+            if health.get('trained'):
+                print(f"✅ Modelo pre-entrenado cargado: {health.get('model_info', {}).get('filename', 'N/A')}")
+            else:
+                print("⚠️ No hay modelo pre-entrenado. Esperando entrenamiento inicial...")
+
+            await ml_service.executor.start()
+            await ml_service.feedback_buffer.start()
+        if "converter" in components:
+            from app.services.conversion_jobs import conversion_service
+            await conversion_service.start()
+        print("=" * 50)
+
+        yield  # Aquí la aplicación está corriendo
+
+        # Shutdown
+        print("🛑 ML Service cerrando...")
+        if ml_service is not None:
+            await ml_service.feedback_buffer.stop()
+            await ml_service.executor.shutdown()
+        if "converter" in components:
+            from app.services.conversion_jobs import conversion_service
+            await conversion_service.stop()
+            conversion_service.shutdown()
+
+    return lifespan
+
+
+def create_app(components: Optional[Iterable[str]] = None) -> FastAPI:
+    """
+    Crea la aplicación con los componentes pedidos ("ml", "converter").
+
+    Sin argumento se usa APP_COMPONENTS. Las dependencias pesadas (pandas,
+    scikit-learn, modelos) solo se importan si el componente ml está incluido.
+    """
+    if components is None:
+        components = settings.components
+    elif isinstance(components, str):
+        components = parse_components(components)
     else:
-        print("⚠️ No hay modelo pre-entrenado. Esperando entrenamiento inicial...")
-    
-    print("=" * 50)
-    
-    yield  # Aquí la aplicación está corriendo
-    
-    # Shutdown
-    print("🛑 ML Service cerrando...")
-
-
-app = FastAPI(
-    title="ML Recommendation Service",
-    description="Servicio de recomendaciones ML para auditorías",
-    version="1.0.0",
-    lifespan=lifespan,
-)
-
-# ✅ CORS - Configurado dinámicamente según entorno
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.origins_list,  # ← Usa la lista dinámica
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Incluir rutas
-app.include_router(api_router, prefix="/api/ml")
-
-
-@app.get("/")
-async def root():
-    """Health check principal"""
-    return {
-        "service": "ML Recommendation Service",
-        "status": "running",
-        "version": "1.0.0",
-        "environment": settings.ENVIRONMENT,
-        "allowed_origins": settings.origins_list  # ← Útil para debug
-    }
-
-
-@app.get("/health")
-async def health():
-    """Health check detallado"""
-    return ml_service.check_health()
\ No newline at end of file
+        components = parse_components(",".join(components))
+
+    app = FastAPI(
+        title="ML Recommendation Service",
+        description="Servicio de recomendaciones ML para auditorías",
+        version="1.0.0",
+        lifespan=_build_lifespan(components),
+    )
+    app.state.components = components
+
+    # ✅ CORS - Configurado dinámicamente según entorno
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.origins_list,  # ← Usa la lista dinámica
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Incluir rutas
+    app.include_router(create_api_router(components), prefix="/api/ml")
+
+    @app.get("/")
+    async def root():
+        """Health check principal"""
+        return {
+            "service": "ML Recommendation Service",
+            "status": "running",
+            "version": "1.0.0",
+            "environment": settings.ENVIRONMENT,
+            "components": components,
+            "allowed_origins": settings.origins_list  # ← Útil para debug
+        }
+
+    @app.get("/health")
+    async def health():
+        """Health check detallado"""
+        if "ml" in components:
+            from app.services.ml_service import get_ml_service
+            return {**get_ml_service().check_health(), "admission": admission_controller.stats()}
+
+        from app.services.conversion_jobs import conversion_service
+        return {
+            "status": "healthy",
+            "components": components,
+            "converter": conversion_service.stats(),
+            "admission": admission_controller.stats(),
+        }
+
+    return app
+
+
+app = create_app()
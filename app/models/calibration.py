@@ -0,0 +1,134 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold, cross_val_predict
+
+CALIBRATION_METHODS = ("auto", "isotonic", "sigmoid", "none")
+
+# Con menos muestras la isotónica sobreajusta: "auto" usa sigmoide
+ISOTONIC_MIN_SAMPLES = 1000
+
+
+class ProbabilityCalibrator:
+    """
+    Calibración one-vs-rest de las probabilidades de un clasificador.
+
+    Cada clase tiene su propia curva (isotónica: puntos de interpolación;
+    sigmoide: pendiente y ordenada de Platt) y las filas se renormalizan.
+    En inferencia es solo numpy: no depende de sklearn ni cuesta más que
+    una interpolación por columna.
+    """
+
+    def __init__(self, classes: np.ndarray, method: str, curves: List[Tuple[np.ndarray, np.ndarray]]):
+        self.classes_ = np.asarray(classes)
+        self.method = method
+        self.curves = curves  # isotonic: (x, y) | sigmoid: (array([a]), array([b]))
+        # Mapa etiqueta → columna precalculado (las etiquetas no son posiciones)
+        self.label_to_column: Dict[int, int] = {int(label): i for i, label in enumerate(self.classes_)}
+
+    def columns(self, labels) -> np.ndarray:
+        """Columnas de predict_proba para un arreglo de etiquetas"""
+        return np.array([self.label_to_column[int(label)] for label in labels], dtype=np.int64)
+
+    def transform(self, proba: np.ndarray) -> np.ndarray:
+        """Probabilidades calibradas (filas normalizadas)"""
+        proba = np.asarray(proba, dtype=np.float64)
+        calibrated = np.empty_like(proba)
+        for column, (first, second) in enumerate(self.curves):
+            if self.method == "isotonic":
+                calibrated[:, column] = np.interp(proba[:, column], first, second)
+            else:
+                calibrated[:, column] = 1.0 / (1.0 + np.exp(-(first[0] * proba[:, column] + second[0])))
+
+        totals = calibrated.sum(axis=1, keepdims=True)
+        empty = totals[:, 0] <= 0
+        if empty.any():
+            calibrated[empty] = proba[empty]
+            totals[empty] = np.maximum(proba[empty].sum(axis=1, keepdims=True), 1e-12)
+        return calibrated / totals
+
+
+def _fit_curve(method: str, scores: np.ndarray, target: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    if target.min() == target.max():
+        # La clase nunca (o siempre) aparece: probabilidad constante
+        value = float(target[0])
+        if method == "isotonic":
+            return np.array([0.0, 1.0]), np.array([value, value])
+        return np.array([0.0]), np.array([20.0 if value else -20.0])
+
+    if method == "isotonic":
+        isotonic = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip").fit(scores, target)
+        return isotonic.X_thresholds_.astype(np.float64), isotonic.y_thresholds_.astype(np.float64)
+
+    platt = LogisticRegression(C=1e4).fit(scores.reshape(-1, 1), target)
+    return platt.coef_[0].astype(np.float64), platt.intercept_.astype(np.float64)
+
+
+def out_of_fold_proba(estimator, X: np.ndarray, y: np.ndarray, max_folds: int) -> Tuple[Optional[np.ndarray], int]:
+    """Probabilidades out-of-fold (None si alguna clase no alcanza para 2 folds)"""
+    _, counts = np.unique(y, return_counts=True)
+    folds = int(min(max_folds, counts.min()))
+    if folds < 2:
+        return None, 0
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+    return cross_val_predict(clone(estimator), X, y, cv=cv, method="predict_proba"), folds
+
+
+def brier_score(proba: np.ndarray, columns: np.ndarray) -> float:
+    """Brier multiclase: media de la suma de (p - one_hot)²"""
+    one_hot = np.zeros_like(proba)
+    one_hot[np.arange(len(columns)), columns] = 1.0
+    return float(np.mean(np.sum((proba - one_hot) ** 2, axis=1)))
+
+
+def fit_calibrator(
+    estimator,
+    fitted,
+    X: np.ndarray,
+    y: np.ndarray,
+    method: str = "auto",
+    max_folds: int = 5,
+) -> Tuple[Optional[ProbabilityCalibrator], Dict[str, Any]]:
+    """
+    Ajusta la calibración sobre probabilidades out-of-fold del estimador.
+
+    estimator es el modelo sin entrenar (se clona por fold) y fitted el ya
+    entrenado; si no hay datos para validación cruzada se usan sus
+    probabilidades sobre el propio set de entrenamiento (sesgadas).
+    """
+    if method not in CALIBRATION_METHODS:
+        raise ValueError(f"CALIBRATION_METHOD inválido: {method} (opciones: {CALIBRATION_METHODS})")
+    if method == "none":
+        return None, {"method": "none"}
+    if method == "auto":
+        method = "isotonic" if len(y) >= ISOTONIC_MIN_SAMPLES else "sigmoid"
+
+    y = np.asarray(y)
+    classes = np.asarray(fitted.classes_)
+    if not np.array_equal(classes, np.unique(y)):
+        # p. ej. un bosque destilado que nunca predice alguna clase: sin columnas para calibrarla
+        return None, {"method": "none", "reason": "el modelo no tiene columna para todas las clases"}
+
+    proba, folds = out_of_fold_proba(estimator, X, y, max_folds)
+    source = f"out_of_fold_{folds}"
+    if proba is None:
+        proba, source = fitted.predict_proba(X), "in_sample"
+
+    calibrator = ProbabilityCalibrator(classes, method, [])
+    columns = calibrator.columns(y)
+    calibrator.curves = [
+        _fit_curve(method, proba[:, column], (columns == column).astype(np.float64))
+        for column in range(len(classes))
+    ]
+
+    calibrated = calibrator.transform(proba)
+    report = {
+        "method": method,
+        "source": source,
+        "brier_before": round(brier_score(proba, columns), 6),
+        "brier_after": round(brier_score(calibrated, columns), 6),
+    }
+    return calibrator, report
@@ -0,0 +1,214 @@
+import hashlib
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import orjson
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfTransformer, TfidfVectorizer
+
+# Parámetros del vectorizador que cambian el resultado del analizador (tokens + n-gramas)
+ANALYZER_PARAMS = (
+    "analyzer", "decode_error", "encoding", "input", "lowercase", "ngram_range",
+    "preprocessor", "stop_words", "strip_accents", "token_pattern", "tokenizer",
+)
+
+# Límite de variables por consulta de SQLite
+_CHUNK = 900
+
+
+def analyzer_namespace(vectorizer: TfidfVectorizer) -> str:
+    """Hash de los parámetros del analizador: otro analizador nunca reutiliza entradas"""
+    params = vectorizer.get_params()
+    spec = orjson.dumps({name: repr(params[name]) for name in ANALYZER_PARAMS}, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(spec, digest_size=8).hexdigest()
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class FeatureCache:
+    """
+    Cache persistente (SQLite, WAL) del texto ya analizado para TF-IDF.
+
+    Cada entrada guarda los conteos de términos (tokens y n-gramas) de un
+    texto, indexada por el hash de su contenido y por el analizador que la
+    produjo. Es independiente de la versión del modelo: el vocabulario se
+    recalcula en cada entrenamiento a partir de los conteos, así que solo
+    los textos nuevos pasan por el analizador.
+
+    Solo se usa al entrenar: cada operación abre y cierra su propia conexión,
+    así el cache no deja archivos abiertos entre entrenamientos.
+    """
+
+    def __init__(self, path: str, max_entries: int = 500_000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analyzed (
+                    namespace TEXT NOT NULL,
+                    key BLOB NOT NULL,
+                    counts BLOB NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Conexión de una operación: commit al salir sin error y siempre cerrada"""
+        with self._lock, closing(sqlite3.connect(str(self.path))) as conn:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+
+    def get_many(self, namespace: str, keys: List[bytes]) -> Dict[bytes, Dict[str, int]]:
+        found: Dict[bytes, Dict[str, int]] = {}
+        with self._connect() as conn:
+            for start in range(0, len(keys), _CHUNK):
+                chunk = keys[start:start + _CHUNK]
+                rows = conn.execute(
+                    f"SELECT key, counts FROM analyzed WHERE namespace = ? AND key IN ({','.join('?' * len(chunk))})",
+                    [namespace, *chunk],
+                )
+                found.update((key, orjson.loads(counts)) for key, counts in rows)
+        return found
+
+    def put_many(self, namespace: str, entries: Iterable[Tuple[bytes, Dict[str, int]]]):
+        rows = [(namespace, key, orjson.dumps(counts)) for key, counts in entries]
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO analyzed VALUES (?, ?, ?)", rows)
+            # Descartar las entradas más antiguas por encima del máximo
+            conn.execute(
+                "DELETE FROM analyzed WHERE rowid <= (SELECT MAX(rowid) FROM analyzed) - ?",
+                (self.max_entries,),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM analyzed").fetchone()[0]
+        return {"path": str(self.path), "entries": entries, "max_entries": self.max_entries}
+
+
+def _analyzed_counts(
+    vectorizer: TfidfVectorizer, texts: List[str], cache: FeatureCache
+) -> Tuple[List[Dict[str, int]], Dict[str, int]]:
+    """Conteos de términos de cada texto, analizando solo los que no están en cache"""
+    analyze = vectorizer.build_analyzer()  # ValueError si stop_words o el analizador son inválidos (como en fit)
+    namespace = analyzer_namespace(vectorizer)
+    keys = [text_key(text) for text in texts]
+    counts = cache.get_many(namespace, keys)
+
+    new_entries = []
+    for key, text in zip(keys, texts):
+        if key not in counts:
+            counts[key] = dict(Counter(analyze(text)))
+            new_entries.append((key, counts[key]))
+    cache.put_many(namespace, new_entries)
+
+    stats = {"texts_unique": len(texts), "texts_cached": len(texts) - len(new_entries), "texts_analyzed": len(new_entries)}
+    return [counts[key] for key in keys], stats
+
+
+def _limit_features(vectorizer: TfidfVectorizer, X: sp.csr_matrix, terms: np.ndarray, n_doc: int):
+    """Poda por max_df / min_df / max_features igual que CountVectorizer._limit_features"""
+    max_df, min_df = vectorizer.max_df, vectorizer.min_df
+    max_doc_count = max_df if isinstance(max_df, (int, np.integer)) else max_df * n_doc
+    min_doc_count = min_df if isinstance(min_df, (int, np.integer)) else min_df * n_doc
+    if max_doc_count < min_doc_count:
+        raise ValueError("max_df corresponds to < documents than min_df")
+
+    dfs = np.bincount(X.indices, minlength=X.shape[1])
+    mask = np.ones(len(dfs), dtype=bool)
+    if max_doc_count < n_doc:
+        mask &= dfs <= max_doc_count
+    if min_doc_count > 1:
+        mask &= dfs >= min_doc_count
+    limit = vectorizer.max_features
+    if limit is not None and mask.sum() > limit:
+        tfs = np.asarray(X.sum(axis=0)).ravel()
+        mask_inds = (-tfs[mask]).argsort()[:limit]
+        new_mask = np.zeros(len(dfs), dtype=bool)
+        new_mask[np.where(mask)[0][mask_inds]] = True
+        mask = new_mask
+
+    kept = np.where(mask)[0]
+    if len(kept) == 0:
+        raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+    return X[:, kept], terms[kept], set(terms[~mask].tolist())
+
+
+def fit_transform_cached(
+    vectorizer: TfidfVectorizer, texts: List[str], cache: FeatureCache
+) -> Tuple[sp.csr_matrix, Optional[Dict[str, int]]]:
+    """
+    Equivalente a vectorizer.fit_transform(texts) usando conteos cacheados.
+
+    Los textos repetidos se analizan una sola vez y los ya vistos en
+    entrenamientos anteriores no se vuelven a analizar; la matriz de conteos
+    se arma para los textos únicos y se expande a todas las filas. El
+    vocabulario, idf_ y la matriz resultante coinciden con los de sklearn.
+
+    El vectorizador queda entrenado solo con atributos públicos
+    (vocabulary_, stop_words_ e idf_, cuyo setter arma el transformador).
+    """
+    if vectorizer.vocabulary is not None or not vectorizer.use_idf:
+        # Vocabulario fijo o sin idf_ que fijar: se entrena como siempre
+        return vectorizer.fit_transform(texts), None
+
+    # Textos únicos en orden de primera aparición: los ids de términos salen igual que en sklearn
+    inverse, unique_texts = pd.factorize(pd.Series(texts, dtype=object), sort=False)
+    doc_counts, stats = _analyzed_counts(vectorizer, list(unique_texts), cache)
+
+    vocabulary: Dict[str, int] = {}
+    indices: List[int] = []
+    values: List[int] = []
+    indptr = [0]
+    for counts in doc_counts:
+        for term, count in counts.items():
+            indices.append(vocabulary.setdefault(term, len(vocabulary)))
+            values.append(count)
+        indptr.append(len(indices))
+    if not vocabulary:
+        raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+
+    unique_matrix = sp.csr_matrix(
+        (np.asarray(values, dtype=vectorizer.dtype), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(doc_counts), len(vocabulary)),
+    )
+    unique_matrix.sort_indices()
+    if vectorizer.binary:
+        unique_matrix.data.fill(1)
+    X = unique_matrix[inverse]
+
+    # Columnas en orden alfabético, como _sort_features (que no reordena los índices de cada fila)
+    terms = np.array(sorted(vocabulary), dtype=object)
+    map_index = np.empty(len(terms), dtype=X.indices.dtype)
+    for column, term in enumerate(terms):
+        map_index[vocabulary[term]] = column
+    X.indices = map_index.take(X.indices, mode="clip")
+
+    X, kept_terms, stop_words = _limit_features(vectorizer, X, terms, len(texts))
+
+    tfidf = TfidfTransformer(
+        norm=vectorizer.norm, use_idf=vectorizer.use_idf,
+        smooth_idf=vectorizer.smooth_idf, sublinear_tf=vectorizer.sublinear_tf,
+    ).fit(X)
+    vectorizer.vocabulary_ = {term: column for column, term in enumerate(kept_terms.tolist())}
+    vectorizer.stop_words_ = stop_words
+    vectorizer.idf_ = tfidf.idf_
+    stats["vocabulary"] = len(vectorizer.vocabulary_)
+    return tfidf.transform(X, copy=False), stats
\ No newline at end of file
@@ -0,0 +1,250 @@
+import pickle
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.ensemble import RandomForestClassifier
+
+
+class CompactForest:
+    """
+    Bosque de decisión compacto para inferencia.
+
+    Todos los árboles se aplanan en arreglos contiguos (umbrales float32,
+    índices de nodos int16/int32, features int16) y se recorren de forma
+    vectorizada para todos los árboles y muestras a la vez. Expone la misma
+    interfaz de inferencia que RandomForestClassifier (predict, predict_proba,
+    score, classes_). Los árboles se copian nodo por nodo: toda la reducción
+    de tamaño viene del aplanado y de los tipos más chicos.
+    """
+
+    def __init__(
+        self,
+        classes: np.ndarray,
+        n_features_in: int,
+        roots: np.ndarray,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        leaf_values: np.ndarray,
+        max_depth: int,
+    ):
+        self.classes_ = classes
+        self.n_features_in_ = n_features_in
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left      # En hojas: índice de la fila en leaf_values
+        self.right = right
+        self.leaf_values = leaf_values
+        self.max_depth = max_depth
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        n_samples = X.shape[0]
+        rows = np.arange(n_samples)[None, :]
+        nodes = np.repeat(self.roots.astype(np.int64)[:, None], n_samples, axis=1)
+
+        for _ in range(self.max_depth):
+            features = self.feature[nodes]
+            internal = features >= 0
+            if not internal.any():
+                break
+            go_left = X[rows, np.where(internal, features, 0)] <= self.threshold[nodes]
+            next_nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            nodes = np.where(internal, next_nodes, nodes)
+
+        proba = self.leaf_values[self.left[nodes]].mean(axis=0, dtype=np.float64)
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def score(self, X, y) -> float:
+        return float(np.mean(self.predict(X) == np.asarray(y)))
+
+
+def _float32_at_most(values: np.ndarray) -> np.ndarray:
+    """Redondea a float32 sin superar el valor original (mantiene X <= umbral)"""
+    rounded = values.astype(np.float32)
+    too_big = rounded.astype(np.float64) > values
+    rounded[too_big] = np.nextafter(rounded[too_big], np.float32(-np.inf))
+    return rounded
+
+
+def _compact_tree(tree) -> Tuple[List[Tuple[int, float, int, int]], List[np.ndarray], int]:
+    """Recorre un árbol de sklearn y devuelve sus nodos en orden DFS"""
+    children_left = tree.children_left
+    children_right = tree.children_right
+    values = tree.value[:, 0, :]
+    distributions = values / np.maximum(values.sum(axis=1, keepdims=True), 1e-12)
+
+    nodes: List[List[Any]] = []
+    leaves: List[np.ndarray] = []
+    max_depth = 0
+
+    def visit(node: int, depth: int) -> int:
+        nonlocal max_depth
+        index = len(nodes)
+        if children_left[node] == -1:
+            nodes.append([-1, 0.0, len(leaves), -1])
+            leaves.append(distributions[node])
+            max_depth = max(max_depth, depth)
+            return index
+        nodes.append([int(tree.feature[node]), float(tree.threshold[node]), -1, -1])
+        nodes[index][2] = visit(children_left[node], depth + 1)
+        nodes[index][3] = visit(children_right[node], depth + 1)
+        return index
+
+    visit(0, 0)
+    return nodes, leaves, max_depth
+
+
+def build_compact_forest(forest: RandomForestClassifier) -> CompactForest:
+    """Convierte un RandomForestClassifier entrenado a CompactForest"""
+    roots, feature, threshold, left, right, leaf_values = [], [], [], [], [], []
+    max_depth = 0
+
+    for estimator in forest.estimators_:
+        nodes, leaves, depth = _compact_tree(estimator.tree_)
+        node_offset, leaf_offset = len(feature), len(leaf_values)
+        roots.append(node_offset)
+        for feat, thr, left_child, right_child in nodes:
+            feature.append(feat)
+            threshold.append(thr)
+            if feat < 0:
+                left.append(left_child + leaf_offset)  # índice de hoja
+                right.append(-1)
+            else:
+                left.append(left_child + node_offset)
+                right.append(right_child + node_offset)
+        leaf_values.extend(leaves)
+        max_depth = max(max_depth, depth)
+
+    n_nodes = max(len(feature), len(leaf_values))
+    index_dtype = np.int16 if n_nodes < np.iinfo(np.int16).max else np.int32
+    feature_dtype = np.int16 if forest.n_features_in_ < np.iinfo(np.int16).max else np.int32
+
+    return CompactForest(
+        classes=forest.classes_,
+        n_features_in=forest.n_features_in_,
+        roots=np.array(roots, dtype=np.int32),
+        feature=np.array(feature, dtype=feature_dtype),
+        threshold=_float32_at_most(np.array(threshold, dtype=np.float64)),
+        left=np.array(left, dtype=index_dtype),
+        right=np.array(right, dtype=index_dtype),
+        leaf_values=np.array(leaf_values, dtype=np.float32),
+        max_depth=max_depth,
+    )
+
+
+def distill_forest(
+    teacher: RandomForestClassifier, X: np.ndarray, n_estimators: int
+) -> RandomForestClassifier:
+    """Entrena un bosque más pequeño que imita las predicciones del original"""
+    params = teacher.get_params()
+    params.update(n_estimators=n_estimators)
+    student = RandomForestClassifier(**params)
+    student.fit(X, teacher.predict(X))
+    return student
+
+
+class DistilledForestClassifier(ClassifierMixin, BaseEstimator):
+    """
+    Maestro + destilación como un solo estimador de sklearn.
+
+    Solo se usa para calibrar un modelo destilado: la validación cruzada
+    repite todo el procedimiento (maestro y alumno) en cada fold, así las
+    probabilidades out-of-fold son las del alumno que se sirve.
+    """
+
+    def __init__(self, teacher: Optional[RandomForestClassifier] = None, n_estimators: int = 10):
+        self.teacher = teacher
+        self.n_estimators = n_estimators
+
+    def fit(self, X, y):
+        teacher = clone(self.teacher).fit(X, y)
+        self.student_ = distill_forest(teacher, X, self.n_estimators)
+        self.classes_ = self.student_.classes_
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        return self.student_.predict(X)
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.student_.predict_proba(X)
+
+
+def _pickled_size(model: Any) -> int:
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _latency_ms(model: Any, X: np.ndarray, repeats: int = 50) -> float:
+    """Latencia promedio de predict_proba para una sola observación"""
+    sample = X[:1]
+    model.predict_proba(sample)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        model.predict_proba(sample)
+    return (time.perf_counter() - started) / repeats * 1000
+
+
+def _count_nodes(forest: RandomForestClassifier) -> int:
+    return int(sum(estimator.tree_.node_count for estimator in forest.estimators_))
+
+
+def compact_forest(
+    forest: RandomForestClassifier,
+    X: np.ndarray,
+    y: np.ndarray,
+    distill_estimators: Optional[int] = None,
+) -> Tuple[CompactForest, Dict[str, Any]]:
+    """
+    Compacta un bosque entrenado y reporta los deltas de tamaño, latencia y accuracy.
+
+    Si distill_estimators es mayor que 0 y menor que n_estimators, primero se
+    destila a un bosque con esa cantidad de árboles (la calibración del
+    bosque original ya no sirve: hay que ajustarla sobre el destilado).
+    """
+    source = forest
+    distilled = bool(distill_estimators) and 0 < distill_estimators < forest.n_estimators
+    if distilled:
+        source = distill_forest(forest, X, distill_estimators)
+
+    compact = build_compact_forest(source)
+
+    original_pred = forest.predict(X)
+    compact_pred = compact.predict(X)
+    accuracy_before = float(np.mean(original_pred == y))
+    accuracy_after = float(np.mean(compact_pred == y))
+
+    size_before = _pickled_size(forest)
+    size_after = _pickled_size(compact)
+    latency_before = _latency_ms(forest, X)
+    latency_after = _latency_ms(compact, X)
+
+    report = {
+        'distilled_estimators': distill_estimators if distilled else None,
+        'nodes_before': _count_nodes(forest),
+        'nodes_after': compact.n_nodes,
+        'size_bytes_before': size_before,
+        'size_bytes_after': size_after,
+        'size_ratio': round(size_after / size_before, 4),
+        'latency_ms_before': round(latency_before, 4),
+        'latency_ms_after': round(latency_after, 4),
+        'accuracy_before': accuracy_before,
+        'accuracy_after': accuracy_after,
+        'accuracy_delta': round(accuracy_after - accuracy_before, 6),
+        'agreement': float(np.mean(original_pred == compact_pred)),
+    }
+    return compact, report
@@ -0,0 +1,29 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+
+from app.models.calibration import ProbabilityCalibrator
+
+
+@dataclass(frozen=True, slots=True)
+class ModelBundle:
+    """
+    Modelo servible completo: vectorizador, clasificador, calibrador y etiquetas.
+
+    Es inmutable y el motor lo publica con una sola asignación; la inferencia
+    toma la referencia una vez por lote, así que nunca combina piezas de dos
+    entrenamientos distintos.
+    """
+    vectorizer: Any
+    classifier: Any
+    calibrator: Optional[ProbabilityCalibrator]
+    classes: np.ndarray
+    timestamp: Optional[str] = None
+
+    @classmethod
+    def create(cls, vectorizer, classifier, calibrator: Optional[ProbabilityCalibrator],
+               timestamp: Optional[str] = None) -> "ModelBundle":
+        classes = np.array(classifier.classes_, copy=True)
+        classes.setflags(write=False)
+        return cls(vectorizer, classifier, calibrator, classes, timestamp)
\ No newline at end of file
@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+import orjson
+
+LEVELS = {0: "Crítico", 1: "Deficiente", 2: "Aceptable", 3: "Óptimo"}
+ACTIONS = {
+    0: ("Implementar plan correctivo inmediato", "Documentar no conformidad", "Asignar responsable"),
+    1: ("Desarrollar procedimiento", "Capacitar personal", "Establecer controles"),
+    2: ("Reforzar prácticas", "Documentar lecciones", "Mantener monitoreo"),
+    3: ("Mantener estándares", "Compartir mejores prácticas", "Usar como caso de estudio"),
+}
+
+# Marcador que se reemplaza por la confianza al serializar
+_CONFIDENCE_MARK = "__confidence__"
+
+
+@dataclass(frozen=True, slots=True)
+class RecommendationTemplate:
+    """Parte fija de una recomendación para un par (actual, predicho)"""
+    current_score: int
+    predicted_optimal_score: int
+    current_level: str
+    target_level: str
+    improvement_gap: int
+    priority: str
+    recommended_actions: Tuple[str, ...]
+    analysis: str
+    body_prefix: bytes
+    body_suffix: bytes
+
+    def as_dict(self, confidence: Any) -> Dict[str, Any]:
+        return {
+            'current_score': self.current_score,
+            'predicted_optimal_score': self.predicted_optimal_score,
+            'current_level': self.current_level,
+            'target_level': self.target_level,
+            'confidence': confidence,
+            'improvement_gap': self.improvement_gap,
+            'priority': self.priority,
+            'recommended_actions': list(self.recommended_actions),
+            'analysis': self.analysis,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_template(current: int, predicted: int) -> RecommendationTemplate:
+    """Devuelve (y cachea) la plantilla para un par (actual, predicho)"""
+    gap = predicted - current
+
+    if gap > 0:
+        priority = 'Alta' if gap >= 2 else 'Media'
+        analysis = f"Brecha de {gap} punto(s). Puede alcanzar nivel {predicted}/3 con las acciones recomendadas."
+    else:
+        priority = 'Baja'
+        analysis = f"Observación en nivel esperado ({predicted}/3). Mantener estándares actuales."
+
+    fields = dict(
+        current_score=current,
+        predicted_optimal_score=predicted,
+        current_level=LEVELS.get(current, 'Desconocido'),
+        target_level=LEVELS.get(predicted, 'Desconocido'),
+        improvement_gap=gap,
+        priority=priority,
+        recommended_actions=ACTIONS.get(predicted, ()),
+        analysis=analysis,
+    )
+
+    # Pre-serializar la respuesta completa dejando un hueco para la confianza
+    partial = RecommendationTemplate(**fields, body_prefix=b"", body_suffix=b"")
+    body = orjson.dumps({'status': 'success', 'recommendation': partial.as_dict(_CONFIDENCE_MARK)})
+    prefix, suffix = body.split(orjson.dumps(_CONFIDENCE_MARK))
+
+    return RecommendationTemplate(**fields, body_prefix=prefix, body_suffix=suffix)
+
+
+# Los 4×4 resultados posibles se precalculan al importar
+for _current in LEVELS:
+    for _predicted in LEVELS:
+        get_template(_current, _predicted)
+
+
+@dataclass(frozen=True, slots=True)
+class Recommendation:
+    """Recomendación inmutable: plantilla precalculada + confianza"""
+    template: RecommendationTemplate
+    confidence: float
+
+    @classmethod
+    def create(cls, current: int, predicted: int, confidence: float) -> "Recommendation":
+        return cls(get_template(current, predicted), round(confidence, 2))
+
+    def __reduce__(self):
+        # Al cruzar procesos solo viajan los tres valores, no la plantilla
+        return (
+            Recommendation.create,
+            (self.template.current_score, self.template.predicted_optimal_score, self.confidence),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.template.as_dict(self.confidence)
+
+    def response_body(self) -> bytes:
+        """Body JSON completo de /recommend sin pasar por Pydantic ni dicts intermedios"""
+        return self.template.body_prefix + orjson.dumps(self.confidence) + self.template.body_suffix
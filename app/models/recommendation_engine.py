@@ -2,38 +2,68 @@ import pandas as pd
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.ensemble import RandomForestClassifier
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import hashlib
 import joblib
+import json
 import os
 from datetime import datetime
 from pathlib import Path  # 🔥 NUEVO
 import glob  # 🔥 NUEVO
+from app.core.config import settings
+from app.models.calibration import ProbabilityCalibrator, fit_calibrator
+from app.models.feature_cache import FeatureCache, fit_transform_cached
+from app.models.stop_words import SPANISH_STOP_WORDS
+from app.models.forest_compaction import DistilledForestClassifier, compact_forest
+from app.models.model_bundle import ModelBundle
+from app.models.recommendation import Recommendation
+
+# Cambiar si se modifica la forma de extraer features (invalida los fingerprints previos)
+FINGERPRINT_VERSION = 1
 
 class RecommendationEngine:
-    def __init__(self, model_path: str = './models'):
+    def __init__(self, model_path: str = './models', autoload: bool = True):
         self.model_path = model_path
-        self.tfidf_vectorizer = TfidfVectorizer(
+        # Modelo servido: se reemplaza entero (una sola referencia) al entrenar o cargar
+        self.bundle: Optional[ModelBundle] = None
+        self.feature_cache: Optional[FeatureCache] = None
+        os.makedirs(model_path, exist_ok=True)
+        
+        # 🔥 NUEVO: Intentar cargar modelo al iniciar
+        if autoload:
+            self._load_latest_model()
+    
+    @property
+    def trained(self) -> bool:
+        return self.bundle is not None
+    
+    @property
+    def model_timestamp(self) -> Optional[str]:
+        bundle = self.bundle
+        return bundle.timestamp if bundle is not None else None
+    
+    def _build_vectorizer(self) -> TfidfVectorizer:
+        """Crea un vectorizador TF-IDF sin entrenar"""
+        return TfidfVectorizer(
             max_features=100,
             ngram_range=(1, 2),
-            stop_words='spanish',
+            stop_words=SPANISH_STOP_WORDS,
             min_df=1
         )
-        self.classifier = RandomForestClassifier(
-            n_estimators=20,
+    
+    def _build_classifier(self) -> RandomForestClassifier:
+        """Crea un bosque sin entrenar con los hiperparámetros configurados"""
+        return RandomForestClassifier(
+            n_estimators=settings.FOREST_N_ESTIMATORS,
             random_state=42,
-            max_depth=5,
+            max_depth=settings.FOREST_MAX_DEPTH,
             min_samples_split=2,
             min_samples_leaf=1
         )
-        self.trained = False
-        os.makedirs(model_path, exist_ok=True)
-        
-        # 🔥 NUEVO: Intentar cargar modelo al iniciar
-        self._load_latest_model()
     
     # 🔥 NUEVO MÉTODO: Cargar modelo más reciente
     def _load_latest_model(self):
-        """Carga automáticamente el modelo más reciente disponible"""
+        """Carga el modelo activo (active.json) o, si no hay puntero, el más reciente"""
         try:
             model_dir = Path(self.model_path)
             
@@ -44,57 +74,113 @@ class RecommendationEngine:
                 print("⚠️ No se encontraron modelos pre-entrenados")
                 return
             
-            # Ordenar por nombre (timestamp) - más reciente primero
-            classifier_files.sort(reverse=True)
-            latest_classifier = classifier_files[0]
+            timestamp = self.active_timestamp()
+            if timestamp is None or not (model_dir / f'classifier_{timestamp}.pkl').exists():
+                # Ordenar por nombre (timestamp) - más reciente primero
+                # Formato: classifier_20251122_085149.pkl
+                timestamp = self.latest_timestamp()
             
-            # Extraer timestamp del nombre del archivo
-            # Formato: classifier_20251122_085149.pkl
-            timestamp = latest_classifier.stem.replace('classifier_', '')
-            vectorizer_file = model_dir / f'tfidf_{timestamp}.pkl'
-            
-            if not vectorizer_file.exists():
-                print(f"⚠️ No se encontró vectorizador para {latest_classifier.name}")
-                return
-            
-            # Cargar modelos
-            print(f"📂 Cargando modelo: {latest_classifier.name}")
-            self.classifier = joblib.load(str(latest_classifier))
-            
-            print(f"📂 Cargando vectorizador: {vectorizer_file.name}")
-            self.tfidf_vectorizer = joblib.load(str(vectorizer_file))
-            
-            self.trained = True
-            print(f"✅ Modelo cargado exitosamente desde {latest_classifier.name}")
+            self.load_model(timestamp)
             
         except Exception as e:
             print(f"❌ Error cargando modelo: {e}")
             import traceback
             traceback.print_exc()
-            self.trained = False
+    
+    def latest_timestamp(self) -> Optional[str]:
+        """Timestamp del clasificador más reciente en disco"""
+        classifier_files = sorted(Path(self.model_path).glob('classifier_*.pkl'), reverse=True)
+        if not classifier_files:
+            return None
+        return classifier_files[0].stem.replace('classifier_', '')
+    
+    def active_timestamp(self) -> Optional[str]:
+        """Timestamp fijado como activo en active.json (None si no hay puntero)"""
+        pointer = Path(self.model_path) / 'active.json'
+        if not pointer.exists():
+            return None
+        try:
+            with open(pointer, 'r', encoding='utf-8') as f:
+                return json.load(f).get('timestamp')
+        except (OSError, json.JSONDecodeError):
+            return None
+    
+    def set_active(self):
+        """Fija el modelo cargado como activo para los próximos reinicios"""
+        if self.model_timestamp is None:
+            return
+        pointer = Path(self.model_path) / 'active.json'
+        tmp_pointer = pointer.with_suffix('.tmp')
+        with open(tmp_pointer, 'w', encoding='utf-8') as f:
+            json.dump({'timestamp': self.model_timestamp, 'activated_at': datetime.now().isoformat()}, f)
+        os.replace(tmp_pointer, pointer)
+    
+    def load_model(self, timestamp: str) -> bool:
+        """Carga el par clasificador/vectorizador de un timestamp concreto"""
+        model_dir = Path(self.model_path)
+        classifier_file = model_dir / f'classifier_{timestamp}.pkl'
+        vectorizer_file = model_dir / f'tfidf_{timestamp}.pkl'
+        
+        if not classifier_file.exists():
+            print(f"⚠️ No existe el modelo {classifier_file.name}")
+            return False
+        if not vectorizer_file.exists():
+            print(f"⚠️ No se encontró vectorizador para {classifier_file.name}")
+            return False
+        
+        # Cargar modelos
+        print(f"📂 Cargando modelo: {classifier_file.name}")
+        classifier = joblib.load(str(classifier_file))
+        
+        print(f"📂 Cargando vectorizador: {vectorizer_file.name}")
+        vectorizer = joblib.load(str(vectorizer_file))
+        
+        # Modelos anteriores a la calibración no tienen calibrador
+        calibrator_file = model_dir / f'calibrator_{timestamp}.pkl'
+        calibrator = joblib.load(str(calibrator_file)) if calibrator_file.exists() else None
+        
+        self.bundle = ModelBundle.create(vectorizer, classifier, calibrator, timestamp)
+        print(f"✅ Modelo cargado exitosamente desde {classifier_file.name}")
+        return True
     
     # 🔥 NUEVO MÉTODO: Limpiar modelos antiguos
     def _cleanup_old_models(self, keep_latest: int = 5):
-        """Elimina modelos antiguos para ahorrar espacio"""
+        """Elimina modelos antiguos para ahorrar espacio (nunca el activo)"""
         try:
             model_dir = Path(self.model_path)
             
-            # Obtener todos los archivos de modelo ordenados por fecha (más recientes primero)
+            # Timestamps a conservar: los últimos N + el activo
             classifier_files = sorted(model_dir.glob('classifier_*.pkl'), reverse=True)
-            vectorizer_files = sorted(model_dir.glob('tfidf_*.pkl'), reverse=True)
-            
-            # Eliminar archivos antiguos (mantener solo los últimos N)
-            for old_file in classifier_files[keep_latest:]:
-                old_file.unlink()
-                print(f"🗑️ Eliminado modelo antiguo: {old_file.name}")
+            keep = {f.stem.replace('classifier_', '') for f in classifier_files[:keep_latest]}
+            active = self.active_timestamp()
+            if active:
+                keep.add(active)
             
-            for old_file in vectorizer_files[keep_latest:]:
-                old_file.unlink()
-                print(f"🗑️ Eliminado vectorizador antiguo: {old_file.name}")
+            for pattern, label in (
+                ('classifier_', 'modelo'), ('tfidf_', 'vectorizador'),
+                ('calibrator_', 'calibrador'), ('meta_', 'metadata'),
+            ):
+                suffix = '.json' if pattern == 'meta_' else '.pkl'
+                for old_file in model_dir.glob(f'{pattern}*{suffix}'):
+                    if old_file.stem.replace(pattern, '') not in keep:
+                        old_file.unlink()
+                        print(f"🗑️ Eliminado {label} antiguo: {old_file.name}")
                 
         except Exception as e:
             print(f"⚠️ Error limpiando modelos antiguos: {e}")
     
+    def delete_model(self, timestamp: str):
+        """Elimina de disco los archivos de un modelo (nunca el activo)"""
+        if timestamp == self.active_timestamp():
+            return
+        model_dir = Path(self.model_path)
+        for name in (
+            f'classifier_{timestamp}.pkl', f'tfidf_{timestamp}.pkl',
+            f'calibrator_{timestamp}.pkl', f'meta_{timestamp}.json',
+        ):
+            (model_dir / name).unlink(missing_ok=True)
+        print(f"🗑️ Eliminado modelo descartado: {timestamp}")
+    
     def prepare_data(self, instances: List[Dict[str, Any]]) -> pd.DataFrame:
         """Extrae TODAS las observaciones de TODAS las instancias"""
         data = []
@@ -117,8 +203,13 @@ class RecommendationEngine:
                     })
         return pd.DataFrame(data)
     
-    def train(self, instances: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Entrena el modelo con datos históricos"""
+    def train(self, instances: List[Dict[str, Any]], activate: bool = True) -> Dict[str, Any]:
+        """
+        Entrena el modelo con datos históricos.
+        
+        Con activate=False el modelo se guarda pero no se marca como activo
+        (modelo candidato para evaluación en sombra).
+        """
         print("🔄 Preparando datos...")
         df = self.prepare_data(instances)
         
@@ -134,11 +225,21 @@ class RecommendationEngine:
         
         print(f"✅ Suficientes datos: {total_observations} observaciones de {len(instances)} instancias")
         
+        # 🔏 Si ya existe un modelo con los mismos datos e hiperparámetros, reutilizarlo
+        fingerprint = self._fingerprint(df)
+        reused = self._load_by_fingerprint(fingerprint)
+        if reused is not None:
+            if activate:
+                self.set_active()
+            return reused
+        
         # Preparar features
         text_features = df['question_text'] + ' ' + df['comment'].fillna('')
+        vectorizer = self._build_vectorizer()
+        cache_report = None
         
         try:
-            tfidf_matrix = self.tfidf_vectorizer.fit_transform(text_features)
+            tfidf_matrix, cache_report = self._fit_vectorizer(vectorizer, text_features)
             print(f"📝 Features de texto extraídos: {tfidf_matrix.shape[1]}")
         except ValueError as e:
             print(f"⚠️ Advertencia en TF-IDF: {e}")
@@ -156,98 +257,246 @@ class RecommendationEngine:
         
         print(f"🚀 Entrenando modelo con {X.shape[0]} muestras y {X.shape[1]} features...")
         
-        self.classifier.fit(X, y)
-        train_score = self.classifier.score(X, y)
-        self.trained = True
-        self._save_model()
+        forest = self._build_classifier()
+        forest.fit(X, y)
+        train_score = forest.score(X, y)
         
-        # 🔥 Limpiar modelos antiguos después de guardar
-        self._cleanup_old_models(keep_latest=5)
+        # 🌲 Compactar el bosque para servir (float32/int16, destilación opcional)
+        compaction_report = None
+        if settings.FOREST_COMPACTION:
+            compact, compaction_report = compact_forest(
+                forest, X, y.values,
+                distill_estimators=settings.FOREST_DISTILL_ESTIMATORS
+            )
+            print(
+                f"🌲 Bosque compactado: {compaction_report['size_bytes_before']:,} → "
+                f"{compaction_report['size_bytes_after']:,} bytes, "
+                f"latencia {compaction_report['latency_ms_before']:.3f} → {compaction_report['latency_ms_after']:.3f} ms, "
+                f"accuracy Δ {compaction_report['accuracy_delta']:+.4f}"
+            )
+            served = compact
+        else:
+            served = forest
         
-        print(f"✅ Modelo entrenado: accuracy = {train_score:.2%}")
+        # 🎯 Calibración sobre probabilidades out-of-fold del modelo que se sirve (una sola vez, al entrenar);
+        # si se destiló, cada fold repite maestro → alumno
+        distilled = compaction_report['distilled_estimators'] if compaction_report else None
+        estimator = (
+            DistilledForestClassifier(self._build_classifier(), distilled) if distilled
+            else self._build_classifier()
+        )
+        calibrator, calibration_report = fit_calibrator(
+            estimator, served, X, y.values,
+            method=settings.CALIBRATION_METHOD, max_folds=settings.CALIBRATION_CV
+        )
+        if calibrator is not None:
+            print(
+                f"🎯 Calibración {calibration_report['method']} ({calibration_report['source']}): "
+                f"Brier {calibration_report['brier_before']:.4f} → {calibration_report['brier_after']:.4f}"
+            )
         
-        return {
+        metrics = {
             'accuracy': float(train_score),
             'training_samples': len(df),
             'instances_used': len(instances),
             'features': int(X.shape[1]),
+            'compaction': compaction_report,
+            'calibration': calibration_report,
+            'feature_cache': cache_report,
+            'fingerprint': fingerprint,
+            'reused': False,
             'timestamp': datetime.now().isoformat()
         }
+        timestamp = self._save_model(served, vectorizer, calibrator, metrics)
+        metrics['model_timestamp'] = timestamp
+        # Publicar el modelo nuevo con una sola asignación: predict_batch toma el bundle
+        # una vez por lote y nunca mezcla vectorizador/clasificador/calibrador de versiones distintas
+        self.bundle = ModelBundle.create(vectorizer, served, calibrator, timestamp)
+        if activate:
+            self.set_active()
+        
+        # 🔥 Limpiar modelos antiguos después de guardar
+        self._cleanup_old_models(keep_latest=5)
+        
+        print(f"✅ Modelo entrenado: accuracy = {train_score:.2%}")
+        
+        return metrics
+    
+    def _fit_vectorizer(self, vectorizer: TfidfVectorizer, texts: pd.Series):
+        """
+        fit_transform del vectorizador reutilizando el texto ya analizado.
+
+        Solo los textos que no están en el cache pasan por el analizador; si el
+        cache falla por cualquier otro motivo se entrena desde cero.
+        """
+        if not settings.FEATURE_CACHE_ENABLED:
+            return vectorizer.fit_transform(texts), None
+        try:
+            if self.feature_cache is None:
+                self.feature_cache = FeatureCache(settings.FEATURE_CACHE_PATH, settings.FEATURE_CACHE_MAX_ENTRIES)
+            matrix, report = fit_transform_cached(vectorizer, texts.tolist(), self.feature_cache)
+        except ValueError:
+            raise  # Mismos errores que fit_transform (parámetros o vocabulario vacío)
+        except Exception as e:
+            print(f"⚠️ Cache de features no disponible, se analiza todo el texto: {e}")
+            return vectorizer.fit_transform(texts), None
+        if report:
+            print(f"🗃️ Cache de features: {report['texts_cached']}/{report['texts_unique']} textos únicos reutilizados")
+        return matrix, report
+    
+    def _hyperparameters(self) -> Dict[str, Any]:
+        """Hiperparámetros que determinan el modelo resultante"""
+        return {
+            'fingerprint_version': FINGERPRINT_VERSION,
+            'tfidf': {k: repr(v) for k, v in sorted(self._build_vectorizer().get_params().items())},
+            'forest': {k: repr(v) for k, v in sorted(self._build_classifier().get_params().items())},
+            'compaction': settings.FOREST_COMPACTION,
+            'distill_estimators': settings.FOREST_DISTILL_ESTIMATORS,
+            'calibration': [settings.CALIBRATION_METHOD, settings.CALIBRATION_CV],
+        }
+    
+    def _fingerprint(self, df: pd.DataFrame) -> str:
+        """Hash de la matriz de entrenamiento extraída + hiperparámetros"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps(self._hyperparameters(), sort_keys=True).encode('utf-8'))
+        columns = ['question_text', 'comment', 'response', 'section_compliance', 'overall_compliance']
+        frame = df[columns].copy()
+        frame['comment'] = frame['comment'].fillna('')
+        digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+        return digest.hexdigest()
+    
+    def _load_by_fingerprint(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Carga el modelo existente con el mismo fingerprint y retorna sus métricas guardadas"""
+        model_dir = Path(self.model_path)
+        for meta_file in sorted(model_dir.glob('meta_*.json'), reverse=True):
+            try:
+                with open(meta_file, 'r', encoding='utf-8') as f:
+                    metadata = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if metadata.get('fingerprint') != fingerprint:
+                continue
+            
+            timestamp = meta_file.stem.replace('meta_', '')
+            classifier_file = model_dir / f'classifier_{timestamp}.pkl'
+            vectorizer_file = model_dir / f'tfidf_{timestamp}.pkl'
+            if not (classifier_file.exists() and vectorizer_file.exists()):
+                continue
+            calibration = (metadata.get('metrics') or {}).get('calibration') or {}
+            if calibration.get('method', 'none') != 'none' and not (model_dir / f'calibrator_{timestamp}.pkl').exists():
+                continue  # Le falta el calibrador: reutilizarlo daría confianzas sin calibrar
+            
+            # load_model publica el bundle en una sola asignación; si falla, el modelo servido no cambia
+            if timestamp != self.model_timestamp and not self.load_model(timestamp):
+                continue
+            print(f"♻️ Datos e hiperparámetros idénticos: se reutiliza {classifier_file.name} (sin re-entrenar)")
+            
+            metrics = dict(metadata.get('metrics', {}))
+            metrics.update({'reused': True, 'model_timestamp': timestamp})
+            return metrics
+        return None
     
     def predict(self, question_text: str, current_response: int, 
                 comment: str = '', context: Dict[str, Any] = None) -> Dict[str, Any]:
         """Genera recomendación para una observación"""
-        if not self.trained:
-            raise ValueError("❌ Modelo no entrenado. Por favor entrene el modelo primero.")
-        
-        context = context or {}
-        text = f"{question_text} {comment}"
+        return self.predict_batch([{
+            'question_text': question_text,
+            'current_response': current_response,
+            'comment': comment,
+            'context': context,
+        }])[0].to_dict()
+
+    def predict_batch(self, items: List[Dict[str, Any]], bundle: Optional[ModelBundle] = None) -> List[Recommendation]:
+        """
+        Genera recomendaciones para varias observaciones con una sola llamada a predict_proba.
         
-        # Preparar features
+        Con bundle se usa ese modelo (snapshot del executor); si no, el publicado
+        en este momento. En ambos casos todo el lote sale del mismo bundle.
+        """
+        if bundle is None:
+            bundle = self.bundle
+        if bundle is None:
+            raise ValueError("❌ Modelo no entrenado. Por favor entrene el modelo primero.")
+
+        texts = [f"{item['question_text']} {item.get('comment') or ''}" for item in items]
+        contexts = [item.get('context') or {} for item in items]
+
+        X = self._build_features(bundle, texts, contexts)
+
+        # predict() de RandomForest es argmax sobre predict_proba: una sola pasada por el bosque
+        probabilities = bundle.classifier.predict_proba(X)
+        columns = np.argmax(probabilities, axis=1)
+        predicted_scores = bundle.classes[columns]
+
+        # Confianza = probabilidad (calibrada) de la columna predicha, no de la etiqueta
+        if bundle.calibrator is not None:
+            probabilities = bundle.calibrator.transform(probabilities)
+        confidences = probabilities[np.arange(len(columns)), columns]
+
+        return [
+            self._generate_recommendation(
+                item['current_response'], int(predicted), float(confidence),
+                item['question_text'], item.get('comment') or ''
+            )
+            for item, predicted, confidence in zip(items, predicted_scores, confidences)
+        ]
+
+    def _build_features(self, bundle: ModelBundle, texts: List[str], contexts: List[Dict[str, Any]]) -> np.ndarray:
+        """Construye la matriz de features (TF-IDF + numéricas) para inferencia"""
         try:
-            tfidf_features = self.tfidf_vectorizer.transform([text])
-        except:
-            tfidf_features = np.zeros((1, 0))
-        
-        numeric_features = np.array([[
-            context.get('section_compliance', 50),
-            context.get('overall_compliance', 50)
-        ]])
-        
+            tfidf_features = bundle.vectorizer.transform(texts)
+        except Exception:
+            tfidf_features = np.zeros((len(texts), 0))
+
+        numeric_features = np.array([
+            [context.get('section_compliance', 50), context.get('overall_compliance', 50)]
+            for context in contexts
+        ])
+
         # Combinar features
         if tfidf_features.shape[1] > 0:
-            X = np.hstack([tfidf_features.toarray(), numeric_features])
-        else:
-            X = numeric_features
-        
-        predicted_score = int(self.classifier.predict(X)[0])
-        probabilities = self.classifier.predict_proba(X)[0]
-        confidence = float(probabilities[predicted_score] if len(probabilities) > predicted_score else 0.5)
-        
-        return self._generate_recommendation(
-            current_response, predicted_score, confidence, question_text, comment
-        )
+            return np.hstack([tfidf_features.toarray(), numeric_features])
+        return numeric_features
     
-    def _generate_recommendation(self, current: int, predicted: int, 
-                                  confidence: float, question: str, comment: str) -> Dict[str, Any]:
-        """Genera la recomendación formateada"""
-        levels = {0: "Crítico", 1: "Deficiente", 2: "Aceptable", 3: "Óptimo"}
-        actions = {
-            0: ["Implementar plan correctivo inmediato", "Documentar no conformidad", "Asignar responsable"],
-            1: ["Desarrollar procedimiento", "Capacitar personal", "Establecer controles"],
-            2: ["Reforzar prácticas", "Documentar lecciones", "Mantener monitoreo"],
-            3: ["Mantener estándares", "Compartir mejores prácticas", "Usar como caso de estudio"]
-        }
-        
-        gap = predicted - current
-        
-        if gap > 0:
-            priority = 'Alta' if gap >= 2 else 'Media'
-            analysis = f"Brecha de {gap} punto(s). Puede alcanzar nivel {predicted}/3 con las acciones recomendadas."
-        else:
-            priority = 'Baja'
-            analysis = f"Observación en nivel esperado ({predicted}/3). Mantener estándares actuales."
-        
-        return {
-            'current_score': current,
-            'predicted_optimal_score': predicted,
-            'current_level': levels.get(current, 'Desconocido'),
-            'target_level': levels.get(predicted, 'Desconocido'),
-            'confidence': round(confidence, 2),
-            'improvement_gap': gap,
-            'priority': priority,
-            'recommended_actions': actions.get(predicted, []),
-            'analysis': analysis
-        }
+    def _generate_recommendation(self, current: int, predicted: int,
+                                  confidence: float, question: str, comment: str) -> Recommendation:
+        """Genera la recomendación a partir de la plantilla precalculada"""
+        return Recommendation.create(current, predicted, confidence)
     
-    def _save_model(self):
-        """Guarda el modelo entrenado"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    def _save_model(self, classifier, vectorizer, calibrator: Optional[ProbabilityCalibrator],
+                    metrics: Dict[str, Any]) -> str:
+        """Guarda el modelo entrenado junto con su metadata (fingerprint y métricas)"""
+        # Microsegundos + reserva exclusiva del meta: dos entrenamientos en el mismo
+        # segundo (por plantilla en paralelo, re-entrenos seguidos) no se pisan.
+        # Formato: classifier_20251122_085149_123456.pkl (sigue ordenando por nombre)
+        while True:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            metadata_path = f'{self.model_path}/meta_{timestamp}.json'
+            try:
+                # Vacío hasta el final: _load_by_fingerprint lo saltea mientras tanto
+                open(metadata_path, 'x').close()
+                break
+            except FileExistsError:
+                continue
         classifier_path = f'{self.model_path}/classifier_{timestamp}.pkl'
         vectorizer_path = f'{self.model_path}/tfidf_{timestamp}.pkl'
         
-        joblib.dump(self.classifier, classifier_path)
-        joblib.dump(self.tfidf_vectorizer, vectorizer_path)
+        try:
+            joblib.dump(classifier, classifier_path)
+            joblib.dump(vectorizer, vectorizer_path)
+            if calibrator is not None:
+                joblib.dump(calibrator, f'{self.model_path}/calibrator_{timestamp}.pkl')
+            with open(metadata_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'fingerprint': metrics['fingerprint'],
+                    'hyperparameters': self._hyperparameters(),
+                    'metrics': metrics,
+                }, f, ensure_ascii=False, indent=2)
+        except Exception:
+            Path(metadata_path).unlink(missing_ok=True)
+            raise
         
         print(f"💾 Modelo guardado: classifier_{timestamp}.pkl")
-        print(f"💾 Vectorizador guardado: tfidf_{timestamp}.pkl")
\ No newline at end of file
+        print(f"💾 Vectorizador guardado: tfidf_{timestamp}.pkl")
+        print(f"💾 Metadata guardada: meta_{timestamp}.json")
+        return timestamp
\ No newline at end of file
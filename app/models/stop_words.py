@@ -0,0 +1,23 @@
+from typing import List
+
+# Palabras vacías del español para el TF-IDF. sklearn solo trae la lista
+# "english": stop_words='spanish' no es válido y hacía fallar el vectorizador.
+# Es una lista (no un set) para que get_params() y el fingerprint sean estables.
+SPANISH_STOP_WORDS: List[str] = sorted({
+    "al", "algo", "algunas", "algunos", "ante", "antes", "como", "con", "contra",
+    "cual", "cuando", "de", "del", "desde", "donde", "durante", "el", "ella",
+    "ellas", "ellos", "en", "entre", "era", "erais", "eran", "eras", "eres", "es",
+    "esa", "esas", "ese", "eso", "esos", "esta", "estaba", "estado", "estamos",
+    "estan", "estar", "estas", "este", "esto", "estos", "estoy", "está", "están",
+    "fue", "fueron", "fui", "ha", "había", "habían", "han", "has", "hasta", "hay",
+    "he", "la", "las", "le", "les", "lo", "los", "me", "mi", "mis", "mucho",
+    "muchos", "muy", "más", "mí", "nada", "ni", "nos", "nosotros", "nuestra",
+    "nuestras", "nuestro", "nuestros", "os", "otra", "otras", "otro", "otros",
+    "para", "pero", "poco", "por", "porque", "que", "quien", "quienes", "qué",
+    "se", "sea", "sean", "ser", "si", "sido", "sin", "sobre", "sois", "somos",
+    "son", "soy", "su", "sus", "suya", "suyas", "suyo", "suyos", "sí", "también",
+    "tanto", "te", "tenemos", "tener", "tengo", "ti", "tiene", "tienen", "todo",
+    "todos", "tu", "tus", "tuya", "tuyas", "tuyo", "tuyos", "tú", "un", "una",
+    "uno", "unos", "vosotras", "vosotros", "vuestra", "vuestras", "vuestro",
+    "vuestros", "ya", "yo", "él",
+})
\ No newline at end of file
@@ -29,12 +29,14 @@ class InstanceData(BaseModel):
 
 class TrainingRequest(BaseModel):
     instances: List[Dict[str, Any]]
+    per_template: bool = False  # Entrenar un modelo por templateId
 
 class RecommendationRequest(BaseModel):
     question_text: str
     current_response: int = Field(..., ge=0, le=3)
     comment: Optional[str] = ""
     context: Optional[Dict[str, Any]] = {}
+    template_id: Any = None  # str, {'$oid': ...} u ObjectId; si no viene, se usa context.templateId
 
 class RecommendationResponse(BaseModel):
     current_score: int
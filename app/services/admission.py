@@ -0,0 +1,304 @@
+# app/services/admission.py
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Prioridades: menor = más importante
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BATCH = 2
+
+
+class AdmissionRejected(Exception):
+    """La request no se admite (cola llena, presupuesto de espera agotado o sobrecarga)"""
+
+    def __init__(self, message: str, reason: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class PrioritySemaphore:
+    """
+    Semáforo asyncio con cola por prioridad (y FIFO dentro de cada prioridad).
+
+    Las prioridades batch no pueden tomar los últimos `reserve` lugares, que
+    quedan siempre disponibles para el tráfico interactivo.
+    """
+
+    def __init__(self, capacity: int, reserve: int = 0):
+        self.capacity = max(1, capacity)
+        self.reserve = min(max(0, reserve), self.capacity - 1)
+        self.in_use = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def _can_take(self, priority: int) -> bool:
+        free = self.capacity - self.in_use
+        return free > (self.reserve if priority >= PRIORITY_BATCH else 0)
+
+    def _wake(self):
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)  # Expiró o se canceló
+                continue
+            if not self._can_take(priority):
+                break
+            heapq.heappop(self._waiters)
+            self.in_use += 1
+            future.set_result(None)
+
+    async def acquire(self, priority: int, timeout: float):
+        ahead = bool(self._waiters) and self._waiters[0][0] <= priority
+        if not ahead and self._can_take(priority):
+            self.in_use += 1
+            return
+        if timeout <= 0:
+            raise asyncio.TimeoutError
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except BaseException:
+            # Timeout o cliente desconectado: si el lugar se otorgó igual, devolverlo
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.in_use -= 1
+        self._wake()
+
+
+class SystemLoad:
+    """
+    Uso de CPU y memoria del contenedor (cgroup v2) o del host como respaldo.
+
+    Las lecturas se cachean `ttl` segundos para no tocar /sys en cada request.
+    """
+
+    CGROUP = Path("/sys/fs/cgroup")
+
+    def __init__(self, ttl: float = 0.5):
+        self.ttl = ttl
+        self._cached: Tuple[float, float, float] = (0.0, 0.0, 0.0)  # (cuando, cpu, memoria)
+        self._last_cpu: Optional[Tuple[float, float]] = None
+
+    def _cgroup_cpu_limit(self) -> float:
+        try:
+            quota, period = (self.CGROUP / "cpu.max").read_text().split()
+            if quota != "max":
+                return int(quota) / int(period)
+        except (OSError, ValueError):
+            pass
+        return float(os.cpu_count() or 1)
+
+    def _cpu(self) -> float:
+        """Fracción de CPU disponible en uso (1.0 = todos los cores ocupados)"""
+        try:
+            usage_usec = next(
+                int(line.split()[1])
+                for line in (self.CGROUP / "cpu.stat").read_text().splitlines()
+                if line.startswith("usage_usec")
+            )
+        except (OSError, StopIteration, ValueError):
+            return os.getloadavg()[0] / (os.cpu_count() or 1)
+
+        now = time.monotonic()
+        previous, self._last_cpu = self._last_cpu, (now, usage_usec)
+        if previous is None or now <= previous[0]:
+            return 0.0
+        used_seconds = (usage_usec - previous[1]) / 1e6
+        return used_seconds / (now - previous[0]) / self._cgroup_cpu_limit()
+
+    def _memory(self) -> float:
+        """Fracción de memoria en uso"""
+        try:
+            limit = (self.CGROUP / "memory.max").read_text().strip()
+            if limit != "max":
+                return int((self.CGROUP / "memory.current").read_text()) / int(limit)
+        except (OSError, ValueError):
+            pass
+        try:
+            meminfo = {
+                line.split(":")[0]: int(line.split()[1])
+                for line in Path("/proc/meminfo").read_text().splitlines()
+            }
+            return 1.0 - meminfo["MemAvailable"] / meminfo["MemTotal"]
+        except (OSError, KeyError, ValueError, IndexError):
+            return 0.0
+
+    def sample(self) -> Tuple[float, float]:
+        when, cpu, memory = self._cached
+        now = time.monotonic()
+        if now - when >= self.ttl:
+            cpu, memory = self._cpu(), self._memory()
+            self._cached = (now, cpu, memory)
+        return cpu, memory
+
+
+@dataclass
+class RouteLimit:
+    name: str
+    max_concurrent: int
+    queue_budget_ms: float
+    priority: int
+    resource_aware: bool = False
+
+
+def route_limits_from_settings() -> Dict[str, RouteLimit]:
+    return {
+        limit.name: limit for limit in (
+            RouteLimit("recommend", settings.ADMISSION_RECOMMEND_CONCURRENCY,
+                       settings.ADMISSION_RECOMMEND_QUEUE_MS, PRIORITY_INTERACTIVE),
+            RouteLimit("feedback", settings.ADMISSION_FEEDBACK_CONCURRENCY,
+                       settings.ADMISSION_FEEDBACK_QUEUE_MS, PRIORITY_NORMAL),
+            RouteLimit("train", settings.ADMISSION_TRAIN_CONCURRENCY,
+                       settings.ADMISSION_TRAIN_QUEUE_MS, PRIORITY_BATCH, resource_aware=True),
+            RouteLimit("converter", settings.ADMISSION_CONVERTER_CONCURRENCY,
+                       settings.ADMISSION_CONVERTER_QUEUE_MS, PRIORITY_BATCH, resource_aware=True),
+        )
+    }
+
+
+class _RouteState:
+    def __init__(self, limit: RouteLimit):
+        self.limit = limit
+        self.semaphore = PrioritySemaphore(limit.max_concurrent)
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "timeout": 0, "overload": 0}
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class AdmissionController:
+    """
+    Control de admisión por ruta antes de que la request consuma CPU.
+
+    Cada ruta tiene su semáforo de concurrencia y un presupuesto de espera;
+    además todas comparten un semáforo global con prioridad, donde /recommend
+    pasa primero y el trabajo batch (train, converter) nunca ocupa los lugares
+    reservados para tráfico interactivo. Las rutas batch también esperan (o se
+    rechazan) mientras la CPU o la memoria superan los umbrales.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, RouteLimit]] = None,
+        max_concurrent: int = settings.ADMISSION_MAX_CONCURRENT,
+        interactive_reserve: int = settings.ADMISSION_INTERACTIVE_RESERVE,
+        max_waiting: int = settings.ADMISSION_MAX_WAITING,
+        cpu_threshold: float = settings.ADMISSION_CPU_THRESHOLD,
+        memory_threshold: float = settings.ADMISSION_MEMORY_THRESHOLD,
+    ):
+        self.limits = limits if limits is not None else route_limits_from_settings()
+        self.routes = {name: _RouteState(limit) for name, limit in self.limits.items()}
+        self.global_semaphore = PrioritySemaphore(max_concurrent, reserve=interactive_reserve)
+        self.max_waiting = max(0, max_waiting)
+        self.cpu_threshold = cpu_threshold
+        self.memory_threshold = memory_threshold
+        self.load = SystemLoad()
+
+    def _overloaded(self) -> Optional[str]:
+        cpu, memory = self.load.sample()
+        if cpu > self.cpu_threshold:
+            return f"CPU al {cpu:.0%} (umbral {self.cpu_threshold:.0%})"
+        if memory > self.memory_threshold:
+            return f"memoria al {memory:.0%} (umbral {self.memory_threshold:.0%})"
+        return None
+
+    def _reject(self, state: _RouteState, reason: str, message: str, retry_after: float):
+        state.rejected[reason] += 1
+        raise AdmissionRejected(message, reason, retry_after)
+
+    async def acquire(self, route: str):
+        """Espera un lugar para la ruta dentro de su presupuesto o lanza AdmissionRejected"""
+        state = self.routes[route]
+        limit = state.limit
+        started = time.monotonic()
+        deadline = started + limit.queue_budget_ms / 1000
+        retry_after = max(1.0, limit.queue_budget_ms / 1000)
+
+        if state.semaphore.waiting + self.global_semaphore.waiting >= self.max_waiting:
+            self._reject(state, "queue_full", f"Demasiadas requests en espera para {route}", retry_after)
+
+        # Trabajo batch: esperar a que baje la carga del sistema
+        if limit.resource_aware:
+            reason = self._overloaded()
+            while reason is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._reject(state, "overload", f"Servidor sobrecargado ({reason}); reintentar más tarde", retry_after)
+                await asyncio.sleep(min(0.1, remaining))
+                reason = self._overloaded()
+
+        try:
+            await state.semaphore.acquire(limit.priority, deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            self._reject(state, "timeout", f"Sin capacidad para {route} en {limit.queue_budget_ms:g}ms", retry_after)
+        try:
+            await self.global_semaphore.acquire(limit.priority, deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            state.semaphore.release()
+            self._reject(state, "timeout", f"Sin capacidad para {route} en {limit.queue_budget_ms:g}ms", retry_after)
+        except BaseException:
+            # Cancelación (cliente desconectado) u otro error: no perder el lugar de la ruta
+            state.semaphore.release()
+            raise
+
+        waited = time.monotonic() - started
+        state.admitted += 1
+        state.wait_total += waited
+        state.wait_max = max(state.wait_max, waited)
+
+    def release(self, route: str):
+        self.global_semaphore.release()
+        self.routes[route].semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        cpu, memory = self.load.sample()
+        return {
+            'global': {
+                'in_use': self.global_semaphore.in_use,
+                'capacity': self.global_semaphore.capacity,
+                'interactive_reserve': self.global_semaphore.reserve,
+                'waiting': self.global_semaphore.waiting,
+            },
+            'system': {
+                'cpu': round(cpu, 3),
+                'memory': round(memory, 3),
+                'cpu_threshold': self.cpu_threshold,
+                'memory_threshold': self.memory_threshold,
+            },
+            'routes': {
+                name: {
+                    'in_flight': state.semaphore.in_use,
+                    'max_concurrent': state.limit.max_concurrent,
+                    'waiting': state.semaphore.waiting,
+                    'queue_budget_ms': state.limit.queue_budget_ms,
+                    'priority': state.limit.priority,
+                    'admitted': state.admitted,
+                    'rejected': dict(state.rejected),
+                    'avg_wait_ms': round(state.wait_total / state.admitted * 1000, 3) if state.admitted else 0.0,
+                    'max_wait_ms': round(state.wait_max * 1000, 3),
+                }
+                for name, state in self.routes.items()
+            },
+        }
+
+
+# Instancia global
+admission_controller = AdmissionController()
@@ -0,0 +1,422 @@
+# app/services/conversion_jobs.py
+import asyncio
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+# Opciones del filtro calc_pdf_Export de LibreOffice por preset de calidad
+QUALITY_PRESETS: Dict[str, Dict[str, Any]] = {
+    "draft": {
+        "Quality": 50,
+        "ReduceImageResolution": True,
+        "MaxImageResolution": 150,
+        "UseLosslessCompression": False,
+    },
+    "normal": {
+        "Quality": 85,
+        "ReduceImageResolution": True,
+        "MaxImageResolution": 300,
+        "UseLosslessCompression": False,
+    },
+    "high": {
+        "Quality": 100,
+        "ReduceImageResolution": False,
+        "UseLosslessCompression": True,
+    },
+}
+
+JOB_STATUSES = ("queued", "running", "done", "failed", "timeout")
+FINISHED_STATUSES = ("done", "failed", "timeout")
+
+
+class ConversionError(Exception):
+    """LibreOffice terminó con error o no generó el PDF"""
+
+    def __init__(self, message: str, stdout: str = "", stderr: str = ""):
+        super().__init__(message)
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+class ConversionTimeout(Exception):
+    """La conversión superó el timeout del job"""
+
+
+class ConversionQueueFull(Exception):
+    """Ya hay max_pending conversiones encoladas o en curso"""
+
+
+def pdf_export_filter(quality: str) -> str:
+    """Argumento de --convert-to con las opciones del preset (sintaxis JSON de LibreOffice ≥ 7.4)"""
+    if quality not in QUALITY_PRESETS:
+        raise ValueError(f"Calidad inválida: {quality} (opciones: {', '.join(QUALITY_PRESETS)})")
+    options = {}
+    for name, value in QUALITY_PRESETS[quality].items():
+        if isinstance(value, bool):
+            options[name] = {"type": "boolean", "value": "true" if value else "false"}
+        else:
+            options[name] = {"type": "long", "value": str(value)}
+    return "pdf:calc_pdf_Export:" + json.dumps(options, separators=(",", ":"))
+
+
+def run_libreoffice(
+    input_path: Path,
+    output_dir: Path,
+    quality: str = "normal",
+    timeout: float = settings.CONVERTER_TIMEOUT_S,
+    profile_dir: Optional[Path] = None,
+) -> Path:
+    """
+    Convierte un Excel a PDF con LibreOffice (bloqueante).
+
+    Cada worker usa su propio perfil de usuario para que varias instancias
+    puedan convertir en paralelo. Si se supera el timeout se mata todo el
+    grupo de procesos (soffice lanza procesos hijos).
+    """
+    command = [
+        settings.LIBREOFFICE_BIN,
+        "--headless",
+        "--invisible",
+        "--nocrashreport",
+        "--nodefault",
+        "--nofirststartwizard",
+        "--nolockcheck",
+        "--nologo",
+        "--norestore",
+    ]
+    if profile_dir is not None:
+        command.append(f"-env:UserInstallation={profile_dir.resolve().as_uri()}")
+    command += [
+        "--convert-to", pdf_export_filter(quality),
+        "--outdir", str(output_dir),
+        str(input_path),
+    ]
+
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True,
+    )
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.communicate()
+        raise ConversionTimeout(f"La conversión tardó demasiado tiempo (>{timeout:g} segundos)")
+
+    if process.returncode != 0:
+        raise ConversionError(stderr or "Error desconocido de LibreOffice", stdout, stderr)
+
+    pdf_files = list(output_dir.glob("*.pdf"))
+    if not pdf_files:
+        raise ConversionError("LibreOffice no generó el archivo PDF esperado", stdout, stderr)
+    return pdf_files[0]
+
+
+@dataclass
+class ConversionJob:
+    id: str
+    filename: str
+    quality: str
+    timeout_s: float
+    status: str = "queued"
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    duration_s: Optional[float] = None
+    input_bytes: int = 0
+    size_bytes: Optional[int] = None
+    pdf_name: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    @property
+    def output_filename(self) -> str:
+        return f"{Path(self.filename).stem}.pdf"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class ConversionJobService:
+    """
+    Jobs de conversión Excel → PDF.
+
+    El upload se guarda en un directorio por job y la conversión corre en un
+    pool de workers; el estado se persiste en job.json para que los
+    resultados sobrevivan a un reinicio hasta que expiran (CONVERTER_RESULT_TTL_S).
+
+    Las conversiones encoladas o en curso (síncronas y jobs) no superan
+    max_pending, el mismo límite que la admisión aplica a la ruta del
+    conversor: un job que ya respondió 202 sigue contando hasta terminar.
+    Entre start() y stop() una tarea de fondo elimina los jobs expirados
+    cada purge_interval_s segundos.
+    """
+
+    def __init__(
+        self,
+        jobs_dir: str = settings.CONVERTER_JOBS_DIR,
+        workers: int = settings.CONVERTER_WORKERS,
+        default_timeout: float = settings.CONVERTER_TIMEOUT_S,
+        max_timeout: float = settings.CONVERTER_MAX_TIMEOUT_S,
+        result_ttl_s: int = settings.CONVERTER_RESULT_TTL_S,
+        max_pending: int = settings.ADMISSION_CONVERTER_CONCURRENCY,
+        purge_interval_s: float = settings.CONVERTER_PURGE_INTERVAL_S,
+    ):
+        self.jobs_dir = Path(jobs_dir)
+        self.profiles_dir = self.jobs_dir / ".profiles"
+        self.workers = max(1, workers)
+        self.default_timeout = default_timeout
+        self.max_timeout = max(max_timeout, default_timeout)
+        self.result_ttl_s = result_ttl_s
+        self.max_pending = max(1, max_pending)
+        self.purge_interval_s = max(1.0, purge_interval_s)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+
+        self._jobs: Dict[str, ConversionJob] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._futures = set()  # Conversiones en curso: referencia hasta que terminan
+        self._purge_task: Optional[asyncio.Task] = None
+        self._load_jobs()
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+    def job_dir(self, job_id: str) -> Path:
+        return self.jobs_dir / job_id
+
+    def input_path(self, job: ConversionJob) -> Path:
+        return self.job_dir(job.id) / f"input{Path(job.filename).suffix.lower()}"
+
+    def pdf_path(self, job: ConversionJob) -> Optional[Path]:
+        if job.pdf_name is None:
+            return None
+        return self.job_dir(job.id) / "output" / job.pdf_name
+
+    def _save(self, job: ConversionJob):
+        path = self.job_dir(job.id) / "job.json"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _load_jobs(self):
+        """Recupera los jobs de disco; los que estaban en curso quedan como fallidos"""
+        for meta in self.jobs_dir.glob("*/job.json"):
+            try:
+                with open(meta, "r", encoding="utf-8") as f:
+                    job = ConversionJob(**json.load(f))
+            except (OSError, TypeError, json.JSONDecodeError) as e:
+                print(f"⚠️  [CONVERTER] Job ilegible {meta.parent.name}: {e}")
+                continue
+            if not job.finished:
+                job.status = "failed"
+                job.error = "Conversión interrumpida por reinicio del servicio"
+                job.finished_at = datetime.now().isoformat()
+                self._save(job)
+            self._jobs[job.id] = job
+        if self._jobs:
+            print(f"📂 [CONVERTER] {len(self._jobs)} jobs recuperados de {self.jobs_dir}")
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+    def resolve_timeout(self, requested: Optional[float]) -> float:
+        if requested is None or requested <= 0:
+            return self.default_timeout
+        return min(float(requested), self.max_timeout)
+
+    def create_job(self, filename: str, quality: str = "normal", timeout: Optional[float] = None) -> ConversionJob:
+        """Registra un job nuevo (el upload se escribe en input_path antes de enviarlo)"""
+        pdf_export_filter(quality)  # Valida el preset antes de aceptar el archivo
+        job = ConversionJob(
+            id=str(uuid.uuid4()),
+            filename=filename,
+            quality=quality,
+            timeout_s=self.resolve_timeout(timeout),
+        )
+        (self.job_dir(job.id) / "output").mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._save(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[ConversionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def submit(self, job: ConversionJob) -> "asyncio.Future[ConversionJob]":
+        """Encola la conversión en el pool de workers o lanza ConversionQueueFull"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise ConversionQueueFull(
+                    f"Hay {self._pending} conversiones en cola o en curso (máximo {self.max_pending})"
+                )
+            self._pending += 1
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="converter")
+        job.input_bytes = self.input_path(job).stat().st_size
+        self._save(job)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._pool, self._run, job)
+        self._futures.add(future)
+        future.add_done_callback(lambda done: self._finished(job, done))
+        return future
+
+    def _finished(self, job: ConversionJob, future: "asyncio.Future[ConversionJob]"):
+        self._futures.discard(future)
+        with self._lock:
+            self._pending -= 1
+        if not future.cancelled() and future.exception() is not None:
+            # _run ya captura los errores de conversión: esto es un fallo al guardar el estado
+            print(f"❌ [CONVERTER] Job {job.id}: el worker terminó con error: {future.exception()!r}")
+
+    def _run(self, job: ConversionJob) -> ConversionJob:
+        job.status = "running"
+        job.started_at = datetime.now().isoformat()
+        self._save(job)
+        print(f"🔧 [CONVERTER] Job {job.id}: convirtiendo {job.filename} (calidad={job.quality}, timeout={job.timeout_s:g}s)")
+
+        # Un perfil de LibreOffice por worker: dos soffice no pueden compartirlo
+        worker = re.sub(r"[^A-Za-z0-9_]", "_", threading.current_thread().name)
+        started = time.perf_counter()
+        try:
+            pdf = run_libreoffice(
+                self.input_path(job),
+                self.job_dir(job.id) / "output",
+                quality=job.quality,
+                timeout=job.timeout_s,
+                profile_dir=self.profiles_dir / worker,
+            )
+            job.pdf_name = pdf.name
+            job.size_bytes = pdf.stat().st_size
+            job.status = "done"
+            print(f"✅ [CONVERTER] Job {job.id}: PDF listo ({job.size_bytes:,} bytes)")
+        except ConversionTimeout as e:
+            job.status = "timeout"
+            job.error = str(e)
+            print(f"❌ [CONVERTER] Job {job.id}: {e}")
+        except ConversionError as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"❌ [CONVERTER] Job {job.id}: error en LibreOffice")
+            print(f"   stdout: {e.stdout}")
+            print(f"   stderr: {e.stderr}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"❌ [CONVERTER] Job {job.id}: error inesperado: {e}")
+        finally:
+            job.duration_s = round(time.perf_counter() - started, 3)
+            job.finished_at = datetime.now().isoformat()
+            self._save(job)
+            # El Excel ya no hace falta una vez convertido
+            self.input_path(job).unlink(missing_ok=True)
+        return job
+
+    def delete(self, job_id: str) -> bool:
+        """Elimina un job terminado y sus archivos"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            if not job.finished:
+                raise ValueError("El job todavía está en curso")
+            del self._jobs[job_id]
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        return True
+
+    def purge(self, max_age_s: float) -> int:
+        """Elimina los jobs terminados hace más de max_age_s segundos"""
+        cutoff = time.time() - max_age_s
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished and datetime.fromisoformat(job.finished_at).timestamp() < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        for job_id in expired:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        if expired:
+            print(f"🧹 [CONVERTER] {len(expired)} jobs expirados eliminados")
+        return len(expired)
+
+    def purge_expired(self) -> int:
+        if self.result_ttl_s <= 0:
+            return 0
+        return self.purge(self.result_ttl_s)
+
+    async def start(self):
+        """Arranca la purga periódica de jobs expirados"""
+        if self.result_ttl_s <= 0 or (self._purge_task is not None and not self._purge_task.done()):
+            return
+        self._purge_task = asyncio.get_running_loop().create_task(self._purge_loop())
+
+    async def stop(self):
+        if self._purge_task is not None:
+            self._purge_task.cancel()
+            try:
+                await self._purge_task
+            except asyncio.CancelledError:
+                pass
+            self._purge_task = None
+
+    async def _purge_loop(self):
+        while True:
+            try:
+                # rmtree de los directorios: fuera del event loop
+                await asyncio.to_thread(self.purge_expired)
+            except Exception as e:
+                print(f"⚠️  [CONVERTER] Error purgando jobs expirados: {e}")
+            await asyncio.sleep(self.purge_interval_s)
+
+    def list_jobs(self) -> List[ConversionJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {status: 0 for status in JOB_STATUSES}
+        for job in self.list_jobs():
+            counts[job.status] += 1
+        return {
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "default_timeout_s": self.default_timeout,
+            "max_timeout_s": self.max_timeout,
+            "result_ttl_s": self.result_ttl_s,
+            "jobs": counts,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Instancia global
+conversion_service = ConversionJobService()
@@ -0,0 +1,202 @@
+# app/services/feedback_buffer.py
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.feedback_store import FeedbackStore
+
+FSYNC_POLICIES = ("always", "periodic", "never")
+
+
+class FeedbackWriteBuffer:
+    """
+    Buffer write-behind para feedback.
+
+    Los feedbacks se acumulan en memoria y se escriben al store en lotes, por
+    tamaño (FEEDBACK_FLUSH_BATCH_SIZE) o por tiempo (FEEDBACK_FLUSH_INTERVAL_MS),
+    desde una tarea en background. La respuesta HTTP no espera al disco.
+
+    Políticas de fsync:
+        always   → fsync después de cada lote
+        periodic → fsync como máximo cada FEEDBACK_FSYNC_INTERVAL_S segundos
+        never    → se delega al sistema operativo (igual se hace fsync al cerrar)
+    """
+
+    def __init__(
+        self,
+        store: FeedbackStore,
+        batch_size: int = settings.FEEDBACK_FLUSH_BATCH_SIZE,
+        flush_interval_ms: float = settings.FEEDBACK_FLUSH_INTERVAL_MS,
+        max_pending: int = settings.FEEDBACK_MAX_PENDING,
+        fsync_policy: str = settings.FEEDBACK_FSYNC,
+        fsync_interval_s: float = settings.FEEDBACK_FSYNC_INTERVAL_S,
+        archived: Optional[Callable[[], int]] = None,
+    ):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"FEEDBACK_FSYNC inválido: {fsync_policy} (opciones: {FSYNC_POLICIES})")
+
+        self.store = store
+        # Feedbacks ya rotados fuera del store: siguen contando en el total
+        self.archived = archived
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(1.0, flush_interval_ms) / 1000
+        self.max_pending = max(self.batch_size, max_pending)
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval_s
+
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()        # protege _pending
+        self._write_lock = threading.Lock()  # serializa escrituras al store
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_fsync = time.monotonic()
+        self._total: Optional[int] = None
+
+        # 📊 Métricas
+        self._flushes = 0
+        self._flushed_entries = 0
+        self._flush_errors = 0
+        self._last_flush_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._task = loop.create_task(self._flush_loop())
+
+    async def start(self):
+        self._ensure_started()
+        # Contar lo persistido una sola vez y fuera del event loop (en JSONL es un escaneo completo)
+        await asyncio.to_thread(self.recount)
+        print(
+            f"💬 Buffer de feedback: batch={self.batch_size}, intervalo={self.flush_interval * 1000:.0f}ms, "
+            f"fsync={self.fsync_policy}, backend={self.store.location}"
+        )
+
+    async def stop(self):
+        """Detiene la tarea de background y vacía el buffer de forma durable"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush_now, True)
+        print(f"💾 Buffer de feedback vaciado ({self._flushed_entries} feedbacks escritos en total)")
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    def enqueue(self, entry: Dict[str, Any]) -> int:
+        """Encola un feedback (thread-safe, no toca disco). Retorna el total acumulado"""
+        with self._lock:
+            self._pending.append(entry)
+            pending = len(self._pending)
+            if self._total is not None:
+                self._total += 1
+            total = self._total if self._total is not None else pending
+        if pending >= self.batch_size and self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        return total
+
+    async def put(self, entry: Dict[str, Any]) -> int:
+        """Versión async de enqueue: aplica backpressure si el buffer está lleno"""
+        self._ensure_started()
+        if self.pending_count >= self.max_pending:
+            await asyncio.to_thread(self.flush_now)
+        return self.enqueue(entry)
+
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def total_count(self) -> int:
+        """Feedbacks totales (archivados + en el store + en buffer) sin consultar el disco"""
+        if self._total is None:
+            # Solo sin start() (uso fuera del servidor): contar aquí mismo
+            return self.recount()
+        return self._total
+
+    def recount(self) -> int:
+        """
+        Recalcula el total desde el store (bloqueante: llamar desde un thread).
+
+        Con _write_lock tomado no hay flushes en curso, así que lo encolado
+        durante el conteo sigue en _pending y se suma sin duplicar.
+        """
+        with self._write_lock:
+            persisted = self.store.count() + (self.archived() if self.archived is not None else 0)
+            with self._lock:
+                self._total = persisted + len(self._pending)
+                return self._total
+
+    def flush_now(self, force_fsync: bool = False) -> int:
+        """Escribe al store todo lo pendiente (thread-safe). Retorna cuántos se escribieron"""
+        with self._write_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                if force_fsync:
+                    self.store.sync()
+                return 0
+
+            started = time.perf_counter()
+            try:
+                self.store.add_many(batch)
+            except Exception as e:
+                # Devolver el lote al frente del buffer para reintentar
+                with self._lock:
+                    self._pending = batch + self._pending
+                self._flush_errors += 1
+                print(f"❌ Error escribiendo lote de feedback ({len(batch)}): {e}")
+                return 0
+
+            now = time.monotonic()
+            if (
+                force_fsync
+                or self.fsync_policy == "always"
+                or (self.fsync_policy == "periodic" and now - self._last_fsync >= self.fsync_interval)
+            ):
+                self.store.sync()
+                self._last_fsync = now
+
+            self._flushes += 1
+            self._flushed_entries += len(batch)
+            self._last_flush_seconds = time.perf_counter() - started
+            return len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'pending': self.pending_count,
+            'batch_size': self.batch_size,
+            'flush_interval_ms': self.flush_interval * 1000,
+            'max_pending': self.max_pending,
+            'fsync_policy': self.fsync_policy,
+            'flushes': self._flushes,
+            'flushed_entries': self._flushed_entries,
+            'flush_errors': self._flush_errors,
+            'last_flush_ms': round(self._last_flush_seconds * 1000, 3),
+        }
+
+    # ------------------------------------------------------------------
+    # Background
+    # ------------------------------------------------------------------
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self.pending_count:
+                await asyncio.to_thread(self.flush_now)
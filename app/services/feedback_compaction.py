@@ -0,0 +1,345 @@
+# app/services/feedback_compaction.py
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.services.feedback_store import FeedbackStore
+
+# Columnas del archivo compacto (una lista por columna, mismo orden en todas)
+COLUMNS = (
+    "key",
+    "question_text",
+    "current_response",
+    "comment",
+    "accion_seleccionada",
+    "context",
+    "feedback_score",
+    "feedback_type",
+    "timestamp",
+)
+
+
+# Campos que identifican un feedback para deduplicar. El timestamp distingue
+# feedbacks repetidos legítimos (cada uno pesa en el entrenamiento); solo una
+# re-importación del mismo registro da la misma clave.
+KEY_FIELDS = (
+    "question_text",
+    "current_response",
+    "comment",
+    "accion_seleccionada",
+    "context",
+    "feedback_score",
+    "feedback_type",
+    "timestamp",
+)
+
+
+def training_row(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Valores normalizados tal como quedan en las columnas (idempotente)"""
+    context = entry.get("context") or {}
+    if isinstance(context, str):
+        context = json.loads(context)
+    return {
+        "question_text": str(entry.get("question_text", "")),
+        "current_response": int(entry.get("current_response", 0) or 0),
+        "comment": str(entry.get("comment") or "sin comentario"),
+        "accion_seleccionada": str(entry.get("accion_seleccionada", "")),
+        "context": json.dumps(context, ensure_ascii=False, sort_keys=True),
+        "feedback_score": float(np.float32(entry.get("feedback_score", 1.0))),
+        "feedback_type": str(entry.get("feedback_type", "guardado")),
+        "timestamp": str(entry.get("timestamp", "")),
+    }
+
+
+def _row_key(values: List[Any]) -> str:
+    canonical = json.dumps(values, ensure_ascii=False)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def feedback_key(entry: Dict[str, Any]) -> str:
+    """Hash estable de los campos que identifican un feedback (KEY_FIELDS) para deduplicar"""
+    row = training_row(entry)
+    return _row_key([row[name] for name in KEY_FIELDS])
+
+
+def is_training_feedback(entry: Dict[str, Any], min_score: float = 0.5) -> bool:
+    """Solo los feedbacks de recomendaciones ML exitosas sirven para re-entrenar"""
+    return bool(entry.get("fue_recomendacion_ml")) and entry.get("feedback_score", 0) > min_score
+
+
+class FeedbackCompactor:
+    """
+    Compacta el feedback crudo en archivos columnares listos para entrenamiento.
+
+    Cada corrida lee solo lo nuevo desde el último checkpoint, descarta
+    duplicados y feedbacks que no sirven para re-entrenar y escribe el resto
+    como una parte .npz nueva (append-only: el costo depende de lo nuevo, no
+    del historial). Recién con la parte y el checkpoint en disco se rota lo
+    consumido a segmentos .jsonl.gz (backends que rotan, como JSONL); los
+    segmentos y los feedbacks ya consumidos más antiguos que la retención
+    configurada se eliminan. Las corridas se serializan con un lock.
+
+    Las partes viven en un directorio junto a compact_path (sin la extensión);
+    un compact_path de versiones anteriores (archivo único) se sigue leyendo.
+    Cuando hay más de max_parts se fusionan en una sola, así la cantidad de
+    archivos que se leen al re-entrenar no crece sin límite.
+    """
+
+    def __init__(
+        self,
+        store: FeedbackStore,
+        compact_path: str,
+        checkpoint_path: str,
+        segments_dir: str,
+        retention_days: int = 90,
+        rotate: bool = True,
+        max_parts: int = 16,
+    ):
+        self.store = store
+        self.compact_path = Path(compact_path)
+        self.parts_dir = self.compact_path.with_suffix("")
+        self.checkpoint_path = Path(checkpoint_path)
+        self.segments_dir = Path(segments_dir)
+        self.retention_days = retention_days
+        self.rotate = rotate
+        self.max_parts = max(1, max_parts)
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._keys: Optional[Set[str]] = None  # Claves ya compactadas (se cargan una vez)
+
+    # ------------------------------------------------------------------
+    # Checkpoint y columnas
+    # ------------------------------------------------------------------
+    def load_checkpoint(self) -> Dict[str, Any]:
+        checkpoint = {
+            "cursor": 0, "active_id": None, "consumed": 0, "duplicates": 0, "discarded": 0, "skipped": 0,
+            "unrotated": 0, "rotated": 0, "expired": 0, "last_run": None,
+        }
+        if self.checkpoint_path.exists():
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                checkpoint.update(json.load(f))
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: Dict[str, Any]):
+        tmp_path = self.checkpoint_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def archived_count(self) -> int:
+        """Feedbacks ya rotados o expirados fuera del store activo (siguen contando en el total)"""
+        checkpoint = self.load_checkpoint()
+        return int(checkpoint["rotated"]) + int(checkpoint["expired"])
+
+    def _part_files(self) -> List[Path]:
+        parts = sorted(self.parts_dir.glob("part_*.npz"))
+        if self.compact_path.is_file():
+            parts.insert(0, self.compact_path)  # Archivo único de versiones anteriores
+        return parts
+
+    def _load_part(self, path: Path) -> Dict[str, np.ndarray]:
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in COLUMNS}
+
+    def load_columns(self) -> Dict[str, np.ndarray]:
+        """Carga y concatena todas las partes compactas (vacías si aún no hay ninguna)"""
+        parts = [self._load_part(path) for path in self._part_files()]
+        if not parts:
+            return {name: np.array([], dtype=str) for name in COLUMNS}
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+        # Una fusión interrumpida deja filas en la parte nueva y en las viejas: quedarse con una
+        _, first = np.unique(columns["key"], return_index=True)
+        if len(first) < len(columns["key"]):
+            keep = np.sort(first)
+            columns = {name: values[keep] for name, values in columns.items()}
+        return columns
+
+    def _known_keys(self) -> Set[str]:
+        if self._keys is None:
+            # Recalculadas desde las columnas (ya normalizadas): partes escritas con otra
+            # definición de clave siguen deduplicando bien
+            columns = self.load_columns()
+            values = [columns[name].tolist() for name in KEY_FIELDS]
+            self._keys = {_row_key(list(row)) for row in zip(*values)}
+        return self._keys
+
+    def _write_part(self, rows: List[Dict[str, Any]]) -> Path:
+        return self._write_columns({
+            "key": np.array([row["key"] for row in rows], dtype=str),
+            "question_text": np.array([row["question_text"] for row in rows], dtype=str),
+            "current_response": np.array([row["current_response"] for row in rows], dtype=np.int8),
+            "comment": np.array([row["comment"] for row in rows], dtype=str),
+            "accion_seleccionada": np.array([row["accion_seleccionada"] for row in rows], dtype=str),
+            "context": np.array([row["context"] for row in rows], dtype=str),
+            "feedback_score": np.array([row["feedback_score"] for row in rows], dtype=np.float32),
+            "feedback_type": np.array([row["feedback_type"] for row in rows], dtype=str),
+            "timestamp": np.array([row["timestamp"] for row in rows], dtype=str),
+        })
+
+    def _write_columns(self, arrays: Dict[str, np.ndarray]) -> Path:
+        part_path = self.parts_dir / f"part_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.npz"
+        # np.savez agrega ".npz" si el nombre no lo tiene: usar un handle abierto
+        tmp_path = part_path.with_name(part_path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, part_path)
+        return part_path
+
+    def _merge_parts(self) -> int:
+        """Fusiona todas las partes en una sola si superan max_parts. Retorna cuántas se fusionaron"""
+        parts = self._part_files()
+        if len(parts) <= self.max_parts:
+            return 0
+        merged = self._write_columns(self.load_columns())
+        # La parte fusionada ya está en disco: recién ahora borrar las originales
+        for path in parts:
+            path.unlink()
+        print(f"🧩 {len(parts)} partes compactas fusionadas en {merged.name}")
+        return len(parts)
+
+    # ------------------------------------------------------------------
+    # Job
+    # ------------------------------------------------------------------
+    def run(self) -> Dict[str, Any]:
+        """Ejecuta una pasada de compactación incremental (una a la vez)"""
+        with self._lock:
+            return self._run()
+
+    def _run(self) -> Dict[str, Any]:
+        checkpoint = self.load_checkpoint()
+        cursor = checkpoint["cursor"]
+        active_id = self.store.active_id()
+        if checkpoint["active_id"] is not None and checkpoint["active_id"] != active_id:
+            # El store se rotó después del último checkpoint (p. ej. caída entre rotar y guardar)
+            cursor = 0
+        entries, new_cursor = self.store.read_since(cursor)
+
+        known = self._known_keys()
+        rows: List[Dict[str, Any]] = []
+        new_keys: Set[str] = set()
+        duplicates = discarded = skipped = 0
+        for entry in entries:
+            try:
+                if not is_training_feedback(entry):
+                    discarded += 1
+                    continue
+                key = feedback_key(entry)
+                row = training_row(entry)
+            except (TypeError, ValueError, AttributeError) as e:
+                # Un feedback malformado (p. ej. importado) no debe bloquear las compactaciones siguientes
+                skipped += 1
+                print(f"⚠️ Feedback inválido omitido en la compactación: {e}")
+                continue
+            if key in known or key in new_keys:
+                duplicates += 1
+                continue
+            new_keys.add(key)
+            rows.append({"key": key, **row})
+
+        # 1) Datos y checkpoint primero: si algo falla después, no se pierde ni se duplica nada
+        part = self._write_part(rows) if rows else None
+        known.update(new_keys)
+        checkpoint.update({
+            "cursor": new_cursor,
+            "active_id": active_id,
+            "consumed": checkpoint["consumed"] + len(entries),
+            "duplicates": checkpoint["duplicates"] + duplicates,
+            "discarded": checkpoint["discarded"] + discarded,
+            "skipped": checkpoint["skipped"] + skipped,
+            "unrotated": checkpoint["unrotated"] + len(entries),
+            "last_run": datetime.now().isoformat(),
+        })
+        self._save_checkpoint(checkpoint)
+
+        # 2) Recién entonces rotar lo consumido
+        rotated_bytes = 0
+        segment = None
+        if self.rotate and checkpoint["unrotated"]:
+            segment = self.segments_dir / f"feedback_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl.gz"
+            rotated_bytes = self.store.rotate(new_cursor, segment)
+            if rotated_bytes:
+                checkpoint.update({
+                    "cursor": 0,  # El store activo empieza de nuevo tras rotar
+                    "active_id": self.store.active_id(),
+                    "rotated": checkpoint["rotated"] + checkpoint["unrotated"],
+                    "unrotated": 0,
+                })
+                self._save_checkpoint(checkpoint)
+            else:
+                segment = None
+
+        merged_parts = self._merge_parts()
+        removed_segments, expired_rows = self._apply_retention(checkpoint)
+
+        result = {
+            "read": len(entries),
+            "added": len(rows),
+            "duplicates": duplicates,
+            "discarded": discarded,
+            "skipped": skipped,
+            "training_rows": len(known),
+            "part": str(part) if part else None,
+            "merged_parts": merged_parts,
+            "segment": str(segment) if segment else None,
+            "rotated_bytes": rotated_bytes,
+            "removed_segments": removed_segments,
+            "expired_rows": expired_rows,
+            "checkpoint": checkpoint,
+        }
+        print(
+            f"🗜️ Compactación: {len(entries)} leídos, {len(rows)} nuevos, {duplicates} duplicados, "
+            f"{discarded} descartados, {skipped} inválidos → {len(known)} filas de entrenamiento"
+        )
+        return result
+
+    def _apply_retention(self, checkpoint: Dict[str, Any]) -> Tuple[int, int]:
+        """Elimina segmentos y feedbacks consumidos más viejos que la retención"""
+        if self.retention_days <= 0:
+            return 0, 0
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        removed = 0
+        if self.segments_dir.exists():
+            for segment in self.segments_dir.glob("feedback_*.jsonl.gz"):
+                if segment.stat().st_mtime < cutoff.timestamp():
+                    segment.unlink()
+                    removed += 1
+                    print(f"🗑️ Segmento de feedback eliminado por retención: {segment.name}")
+
+        expired = self.store.expire(cutoff.isoformat(), checkpoint["cursor"])
+        if expired:
+            checkpoint["expired"] += expired
+            self._save_checkpoint(checkpoint)
+            print(f"🗑️ {expired} feedbacks ya compactados eliminados del store por retención")
+        return removed, expired
+
+    def training_feedback(self, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Feedbacks listos para re-entrenar, reconstruidos desde las columnas"""
+        columns = self.load_columns()
+        mask = np.ones(len(columns["key"]), dtype=bool)
+        if since is not None:
+            mask &= columns["timestamp"] > since
+        indices = np.flatnonzero(mask)
+        return [
+            {
+                "question_text": str(columns["question_text"][i]),
+                "current_response": int(columns["current_response"][i]),
+                "comment": str(columns["comment"][i]),
+                "accion_seleccionada": str(columns["accion_seleccionada"][i]),
+                "context": json.loads(columns["context"][i]),
+                "feedback_score": float(columns["feedback_score"][i]),
+                "feedback_type": str(columns["feedback_type"][i]),
+                "timestamp": str(columns["timestamp"][i]),
+                "fue_recomendacion_ml": True,
+            }
+            for i in indices
+        ]
@@ -0,0 +1,396 @@
+# app/services/feedback_store.py
+import gzip
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class FeedbackStore(ABC):
+    """Almacenamiento de feedback de usuarios (interfaz común para todos los backends)"""
+
+    location: str
+
+    GROUPABLE_COLUMNS = ("feedback_type", "question_text", "fue_recomendacion_ml", "accion_seleccionada")
+
+    @abstractmethod
+    def add_many(self, entries: List[Dict[str, Any]]) -> int:
+        """Guarda varios feedbacks en una sola operación. Retorna cuántos se guardaron"""
+
+    def add(self, entry: Dict[str, Any]) -> int:
+        return self.add_many([entry])
+
+    @abstractmethod
+    def count(self, **filters) -> int:
+        """Cuenta feedbacks que cumplen los filtros (ver query)"""
+
+    @abstractmethod
+    def query(
+        self,
+        *,
+        since: Optional[str] = None,
+        question_text: Optional[str] = None,
+        feedback_type: Optional[str] = None,
+        fue_recomendacion_ml: Optional[bool] = None,
+        score_above: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Retorna feedbacks filtrados, en orden de llegada"""
+
+    def _check_group_by(self, group_by: str):
+        if group_by not in self.GROUPABLE_COLUMNS:
+            raise ValueError(f"No se puede agrupar por '{group_by}'. Opciones: {self.GROUPABLE_COLUMNS}")
+
+    @abstractmethod
+    def aggregate(self, group_by: str = "feedback_type", **filters) -> Dict[str, Dict[str, Any]]:
+        """Cantidad y score promedio agrupados por una columna"""
+
+    @abstractmethod
+    def read_since(self, cursor: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Lee los feedbacks posteriores a un cursor. Retorna (feedbacks, nuevo cursor)"""
+
+    def rotate(self, cursor: int, segment_path: Path) -> int:
+        """
+        Mueve los feedbacks hasta el cursor a un segmento comprimido y los quita
+        del almacenamiento activo. Retorna cuántos bytes se rotaron (0 si el
+        backend no lo necesita).
+        """
+        return 0
+
+    def expire(self, before: str, cursor: int) -> int:
+        """
+        Elimina los feedbacks ya consumidos (hasta el cursor) con timestamp
+        anterior a `before`. Retorna cuántos se eliminaron (0 si el backend
+        no aplica retención propia).
+        """
+        return 0
+
+    def active_id(self) -> Optional[str]:
+        """Identidad del almacenamiento activo; cambia si se reemplaza (p. ej. al rotar)"""
+        return None
+
+    def sync(self):
+        """Fuerza la persistencia durable (fsync) de lo ya escrito"""
+
+    def close(self):
+        pass
+
+
+def _matches(
+    entry: Dict[str, Any],
+    since: Optional[str] = None,
+    question_text: Optional[str] = None,
+    feedback_type: Optional[str] = None,
+    fue_recomendacion_ml: Optional[bool] = None,
+    score_above: Optional[float] = None,
+) -> bool:
+    if since is not None and entry.get("timestamp", "") <= since:
+        return False
+    if question_text is not None and entry.get("question_text") != question_text:
+        return False
+    if feedback_type is not None and entry.get("feedback_type") != feedback_type:
+        return False
+    if fue_recomendacion_ml is not None and bool(entry.get("fue_recomendacion_ml")) != fue_recomendacion_ml:
+        return False
+    if score_above is not None and not entry.get("feedback_score", 0) > score_above:
+        return False
+    return True
+
+
+class JSONLFeedbackStore(FeedbackStore):
+    """Backend original: un archivo JSONL (consultas con escaneo completo)"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.location = str(self.path)
+        self._lock = threading.Lock()
+        self._count: Optional[int] = None
+
+    def iter_entries(self) -> Iterable[Dict[str, Any]]:
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_num, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"⚠️ Error en línea {line_num}: {e}")
+
+    def add_many(self, entries: List[Dict[str, Any]]) -> int:
+        if not entries:
+            return 0
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+            if self._count is not None:
+                self._count += len(entries)
+        return len(entries)
+
+    def read_since(self, cursor: int) -> Tuple[List[Dict[str, Any]], int]:
+        """El cursor es un offset en bytes; solo se consumen líneas completas"""
+        if not self.path.exists():
+            return [], cursor
+        if cursor > self.path.stat().st_size:
+            cursor = 0  # El archivo fue reemplazado: empezar desde el inicio
+        entries = []
+        with open(self.path, "rb") as f:
+            f.seek(cursor)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # Línea a medio escribir: se lee en la próxima pasada
+                cursor += len(raw)
+                line = raw.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    print(f"⚠️ Línea inválida en offset {cursor - len(raw)}: {e}")
+        return entries, cursor
+
+    def rotate(self, cursor: int, segment_path: Path) -> int:
+        if cursor <= 0 or not self.path.exists():
+            return 0
+        segment_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with self._lock:
+            with open(self.path, "rb") as f:
+                consumed = f.read(cursor)
+                tail = f.read()
+            with gzip.open(segment_path, "wb") as seg:
+                seg.write(consumed)
+            # Reescribir el archivo activo solo con lo no consumido (reemplazo atómico)
+            with open(tmp_path, "wb") as f:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._count = None
+        return len(consumed)
+
+    def active_id(self) -> Optional[str]:
+        # rotate() reemplaza el archivo con os.replace: el inodo nuevo invalida cursores viejos
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_dev}:{stat.st_ino}"
+
+    def sync(self):
+        if not self.path.exists():
+            return
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                os.fsync(f.fileno())
+
+    def count(self, **filters) -> int:
+        if filters:
+            return sum(1 for entry in self.iter_entries() if _matches(entry, **filters))
+        with self._lock:
+            if self._count is None:
+                # Solo se escanea una vez; luego el contador se mantiene en memoria
+                self._count = sum(1 for _ in self.iter_entries())
+            return self._count
+
+    def query(self, *, limit: Optional[int] = None, **filters) -> List[Dict[str, Any]]:
+        results = []
+        for entry in self.iter_entries():
+            if _matches(entry, **filters):
+                results.append(entry)
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+    def aggregate(self, group_by: str = "feedback_type", **filters) -> Dict[str, Dict[str, Any]]:
+        self._check_group_by(group_by)
+        groups: Dict[str, Dict[str, Any]] = {}
+        for entry in self.iter_entries():
+            if not _matches(entry, **filters):
+                continue
+            group = groups.setdefault(str(entry.get(group_by)), {"count": 0, "score_sum": 0.0})
+            group["count"] += 1
+            group["score_sum"] += float(entry.get("feedback_score", 0) or 0)
+        return {
+            key: {"count": g["count"], "avg_score": g["score_sum"] / g["count"]}
+            for key, g in groups.items()
+        }
+
+
+class SQLiteFeedbackStore(FeedbackStore):
+    """
+    Backend SQLite (WAL) con índices para consultas y agregaciones sin escaneo completo.
+
+    No rota: el cursor de compactación (id) ya marca lo consumido y la tabla
+    conserva el historial para query/aggregate. El crecimiento se acota con
+    expire() (retención por antigüedad).
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.location = str(self.path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS feedback (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    question_text TEXT,
+                    current_response INTEGER,
+                    accion_seleccionada TEXT,
+                    fue_recomendacion_ml INTEGER,
+                    feedback_type TEXT,
+                    feedback_score REAL,
+                    payload TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_feedback_timestamp ON feedback(timestamp);
+                CREATE INDEX IF NOT EXISTS idx_feedback_question ON feedback(question_text);
+                CREATE INDEX IF NOT EXISTS idx_feedback_type ON feedback(feedback_type);
+                CREATE INDEX IF NOT EXISTS idx_feedback_ml ON feedback(fue_recomendacion_ml, feedback_score);
+                """
+            )
+
+    @staticmethod
+    def _row(entry: Dict[str, Any]) -> tuple:
+        return (
+            entry.get("timestamp", ""),
+            entry.get("question_text"),
+            entry.get("current_response"),
+            entry.get("accion_seleccionada"),
+            1 if entry.get("fue_recomendacion_ml") else 0,
+            entry.get("feedback_type"),
+            entry.get("feedback_score"),
+            json.dumps(entry, ensure_ascii=False),
+        )
+
+    @staticmethod
+    def _where(
+        since: Optional[str] = None,
+        question_text: Optional[str] = None,
+        feedback_type: Optional[str] = None,
+        fue_recomendacion_ml: Optional[bool] = None,
+        score_above: Optional[float] = None,
+    ) -> tuple:
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("timestamp > ?")
+            params.append(since)
+        if question_text is not None:
+            clauses.append("question_text = ?")
+            params.append(question_text)
+        if feedback_type is not None:
+            clauses.append("feedback_type = ?")
+            params.append(feedback_type)
+        if fue_recomendacion_ml is not None:
+            clauses.append("fue_recomendacion_ml = ?")
+            params.append(1 if fue_recomendacion_ml else 0)
+        if score_above is not None:
+            clauses.append("feedback_score > ?")
+            params.append(score_above)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def add_many(self, entries: List[Dict[str, Any]]) -> int:
+        if not entries:
+            return 0
+        rows = [self._row(entry) for entry in entries]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO feedback (timestamp, question_text, current_response, accion_seleccionada, "
+                "fue_recomendacion_ml, feedback_type, feedback_score, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def read_since(self, cursor: int) -> Tuple[List[Dict[str, Any]], int]:
+        """El cursor es el último id (rowid) consumido"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM feedback WHERE id > ? ORDER BY id", (cursor,)
+            ).fetchall()
+        if not rows:
+            return [], cursor
+        return [json.loads(payload) for _, payload in rows], rows[-1][0]
+
+    def expire(self, before: str, cursor: int) -> int:
+        if cursor <= 0:
+            return 0
+        # AUTOINCREMENT: los ids borrados no se reutilizan, el cursor sigue siendo válido
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM feedback WHERE id <= ? AND timestamp < ?", (cursor, before)
+            ).rowcount
+
+    def count(self, **filters) -> int:
+        where, params = self._where(**filters)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM feedback{where}", params).fetchone()[0]
+
+    def query(self, *, limit: Optional[int] = None, **filters) -> List[Dict[str, Any]]:
+        where, params = self._where(**filters)
+        sql = f"SELECT payload FROM feedback{where} ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def aggregate(self, group_by: str = "feedback_type", **filters) -> Dict[str, Dict[str, Any]]:
+        self._check_group_by(group_by)
+        where, params = self._where(**filters)
+        sql = (
+            f"SELECT {group_by}, COUNT(*), AVG(feedback_score) FROM feedback{where} GROUP BY {group_by}"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        if group_by == "fue_recomendacion_ml":
+            rows = [(str(bool(key)), count, avg) for key, count, avg in rows]
+        return {str(key): {"count": count, "avg_score": avg or 0.0} for key, count, avg in rows}
+
+    def sync(self):
+        # En WAL con synchronous=NORMAL el commit no hace fsync; el checkpoint sí
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_feedback_store(backend: str, jsonl_path: str, sqlite_path: str) -> FeedbackStore:
+    """Crea el backend configurado (FEEDBACK_BACKEND)"""
+    if backend == "sqlite":
+        return SQLiteFeedbackStore(sqlite_path)
+    if backend == "jsonl":
+        return JSONLFeedbackStore(jsonl_path)
+    raise ValueError(f"FEEDBACK_BACKEND inválido: {backend} (use 'jsonl' o 'sqlite')")
+
+
+def import_jsonl(store: FeedbackStore, jsonl_path: str, batch_size: int = 1000) -> int:
+    """Importa un archivo JSONL existente al store en lotes"""
+    source = JSONLFeedbackStore(jsonl_path)
+    imported = 0
+    batch: List[Dict[str, Any]] = []
+    for entry in source.iter_entries():
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            imported += store.add_many(batch)
+            batch = []
+    imported += store.add_many(batch)
+    return imported
@@ -0,0 +1,287 @@
+# app/services/inference_executor.py
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+class InferenceQueueFull(Exception):
+    """La cola de inferencia alcanzó su profundidad máxima"""
+
+
+# 🔧 Estado por worker cuando se usa el pool de procesos (modelo precargado)
+_worker_pool = None
+
+
+def _init_process_worker(model_path: str):
+    """Carga el modelo una sola vez al arrancar cada proceso worker"""
+    global _worker_pool
+    from app.models.recommendation_engine import RecommendationEngine
+    from app.services.model_pool import ModelPool
+    _worker_pool = ModelPool(
+        model_path,
+        fallback=RecommendationEngine(model_path=model_path),
+        max_resident=settings.MODEL_POOL_MAX_RESIDENT,
+    )
+
+
+def _predict_batch_in_process(items: List[Dict[str, Any]]) -> List[Any]:
+    return _worker_pool.predict_batch(items)
+
+
+def _warm_up_worker(delay: float) -> int:
+    """Tarea vacía: ocupa al worker un momento para que cada una caiga en un proceso distinto"""
+    time.sleep(delay)
+    return os.getpid()
+
+
+class InferenceExecutor:
+    """
+    Ejecuta la inferencia fuera del event loop.
+
+    Las solicitudes que llegan dentro de una ventana de pocos milisegundos se
+    agrupan en un solo lote (micro-batching) y se resuelven con una única
+    llamada a predict_proba en un pool de threads o de procesos.
+
+    Los workers nunca leen el modelo que se está entrenando: en modo thread
+    usan el snapshot tomado con snapshot() al crear el executor y en cada
+    reload(); en modo process cada worker carga el suyo de disco. Los
+    procesos se arrancan y cargan el modelo antes de publicar el pool (en
+    start() y en cada reload()), así ningún lote paga el spawn.
+    """
+
+    def __init__(
+        self,
+        predict_batch: Callable[[List[Dict[str, Any]], Any], List[Any]],
+        model_path: str = './models',
+        snapshot: Optional[Callable[[], Any]] = None,
+        mode: str = settings.INFERENCE_EXECUTOR,
+        workers: int = settings.INFERENCE_WORKERS,
+        batch_window_ms: float = settings.INFERENCE_BATCH_WINDOW_MS,
+        max_batch_size: int = settings.INFERENCE_MAX_BATCH_SIZE,
+        max_queue: int = settings.INFERENCE_MAX_QUEUE,
+        blocking_workers: int = settings.BLOCKING_WORKERS,
+    ):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"INFERENCE_EXECUTOR inválido: {mode} (use 'thread' o 'process')")
+
+        self.predict_batch = predict_batch
+        self.model_path = model_path
+        self.snapshot = snapshot
+        self._model = snapshot() if snapshot is not None else None
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.batch_window = max(0.0, batch_window_ms) / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_queue = max(1, max_queue)
+        self.blocking_workers = max(1, blocking_workers)
+
+        self._pool: Optional[Executor] = None
+        self._blocking_pool: Optional[ThreadPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._batch_tasks = set()
+
+        # 📊 Métricas
+        self._pending = 0
+        self._in_flight_batches = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._batches = 0
+        self._batched_items = 0
+        self._max_queue_depth = 0
+        self._busy_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def _create_pool(self) -> Executor:
+        if self.mode == "process":
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(self.model_path,),
+            )
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ml-inference")
+
+    def _warm_up(self, pool: Executor):
+        """Bloquea hasta que todos los procesos del pool corrieron su initializer"""
+        pids = set()
+        for _ in range(3):
+            futures = [pool.submit(_warm_up_worker, 0.05) for _ in range(self.workers)]
+            pids.update(future.result() for future in futures)
+            if len(pids) >= self.workers:
+                break
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._batcher is not None and not self._batcher.done() and self._batcher.get_loop() is loop:
+            return
+        if self._pool is None:
+            self._pool = self._create_pool()
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._pending = 0
+        self._in_flight_batches = 0
+        self._batcher = loop.create_task(self._batch_loop())
+
+    async def start(self):
+        """Arranca el pool (con los procesos ya cargados) y el colector de lotes"""
+        self._ensure_started()
+        if self.mode == "process":
+            await asyncio.to_thread(self._warm_up, self._pool)
+        print(
+            f"⚙️ Executor de inferencia: mode={self.mode}, workers={self.workers}, "
+            f"batch_window={self.batch_window * 1000:.1f}ms, max_batch={self.max_batch_size}, "
+            f"max_queue={self.max_queue}"
+        )
+
+    async def shutdown(self):
+        """Detiene el colector y libera los pools"""
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        if self._blocking_pool is not None:
+            self._blocking_pool.shutdown(wait=True, cancel_futures=True)
+            self._blocking_pool = None
+
+    def reload(self):
+        """
+        Publica el modelo recién entrenado a los workers (nuevo snapshot o nuevos procesos).
+
+        En modo process bloquea hasta que el pool nuevo cargó el modelo: se
+        llama desde el pool bloqueante, nunca desde el event loop.
+        """
+        if self.mode == "thread":
+            if self.snapshot is not None:
+                # Una sola asignación: los lotes en curso terminan con el snapshot anterior
+                self._model = self.snapshot()
+            return
+        if self._pool is None:
+            return
+        new_pool = self._create_pool()
+        try:
+            self._warm_up(new_pool)
+        except BaseException:
+            new_pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        # Recién con los procesos listos se reemplaza: los lotes nuevos no esperan el spawn
+        old_pool, self._pool = self._pool, new_pool
+        old_pool.shutdown(wait=False)
+        print("🔄 Workers de inferencia recargados con el nuevo modelo")
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    async def submit(self, item: Dict[str, Any]) -> Any:
+        """Encola una observación y espera su recomendación"""
+        self._ensure_started()
+        if self._pending >= self.max_queue:
+            self._rejected += 1
+            raise InferenceQueueFull(
+                f"Cola de inferencia llena ({self._pending}/{self.max_queue})"
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending += 1
+        self._submitted += 1
+        self._max_queue_depth = max(self._max_queue_depth, self._pending)
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def run_blocking(self, fn: Callable, *args) -> Any:
+        """Ejecuta trabajo pesado (p. ej. entrenamiento) en un pool aparte del de inferencia"""
+        if self._blocking_pool is None:
+            self._blocking_pool = ThreadPoolExecutor(
+                max_workers=self.blocking_workers, thread_name_prefix="ml-blocking"
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._blocking_pool, fn, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        """Límites de concurrencia, profundidad de cola y métricas de lotes"""
+        return {
+            'mode': self.mode,
+            'workers': self.workers,
+            'blocking_workers': self.blocking_workers,
+            'batch_window_ms': self.batch_window * 1000,
+            'max_batch_size': self.max_batch_size,
+            'max_queue': self.max_queue,
+            'queue_depth': self._pending,
+            'max_queue_depth_seen': self._max_queue_depth,
+            'in_flight_batches': self._in_flight_batches,
+            'submitted': self._submitted,
+            'rejected': self._rejected,
+            'batches': self._batches,
+            'avg_batch_size': round(self._batched_items / self._batches, 2) if self._batches else 0.0,
+            'busy_seconds': round(self._busy_seconds, 3),
+        }
+
+    # ------------------------------------------------------------------
+    # Micro-batching
+    # ------------------------------------------------------------------
+    async def _collect_batch(self) -> List[Tuple[Dict[str, Any], asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.batch_window
+
+        while len(batch) < self.max_batch_size:
+            # Vaciar lo que ya esté en cola sin esperar
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            remaining = deadline - loop.time()
+            if len(batch) >= self.max_batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _batch_loop(self):
+        while True:
+            batch = await self._collect_batch()
+            # Limitar lotes simultáneos al número de workers
+            await self._slots.acquire()
+            self._in_flight_batches += 1
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        items = [item for item, _ in batch]
+        if self.mode == "process":
+            call = (_predict_batch_in_process, items)
+        else:
+            call = (self.predict_batch, items, self._model)
+        started = time.perf_counter()
+        try:
+            results = await loop.run_in_executor(self._pool, *call)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._busy_seconds += time.perf_counter() - started
+            self._batches += 1
+            self._batched_items += len(batch)
+            self._pending -= len(batch)
+            self._in_flight_batches -= 1
+            self._slots.release()
@@ -1,28 +1,184 @@
+from app.models.recommendation import Recommendation
 from app.models.recommendation_engine import RecommendationEngine
+from app.services.inference_executor import InferenceExecutor
+from app.services.model_pool import ModelPool, normalize_template_id
+from app.services.feedback_buffer import FeedbackWriteBuffer
+from app.services.feedback_compaction import FeedbackCompactor
+from app.services.feedback_store import FeedbackStore, JSONLFeedbackStore, create_feedback_store
+from app.services.shadow import ShadowEvaluator
+from app.core.config import settings
 from app.schemas.recommendation import (
     TrainingRequest,
     RecommendationRequest,
     AnalysisRequest
 )
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 from pathlib import Path
-import json
+import threading
 
 class MLService:
     """Servicio que maneja la lógica de negocio ML"""
 
     def __init__(self):
         self.engine = RecommendationEngine(model_path='./models')
-        self.feedback_file = Path('./data/feedback.jsonl')
-        
-        # Crear directorio de datos si no existe
-        self.feedback_file.parent.mkdir(parents=True, exist_ok=True)
+        # 🧩 Modelos especializados por plantilla (el global queda como respaldo)
+        self.model_pool = ModelPool(
+            './models', fallback=self.engine, max_resident=settings.MODEL_POOL_MAX_RESIDENT
+        )
+        # ⚙️ Inferencia fuera del event loop con micro-batching
+        self.executor = InferenceExecutor(
+            predict_batch=self.model_pool.predict_batch,
+            model_path='./models',
+            # Snapshot del modelo global: los workers no leen el engine que se re-entrena
+            snapshot=lambda: self.engine.bundle,
+        )
+        # 💬 Backend de feedback configurable (jsonl | sqlite)
+        self.feedback_store: FeedbackStore = create_feedback_store(
+            settings.FEEDBACK_BACKEND, settings.FEEDBACK_FILE, settings.FEEDBACK_DB_PATH
+        )
+        # Compactación incremental a formato columnar listo para entrenar
+        self.feedback_compactor = FeedbackCompactor(
+            self.feedback_store,
+            compact_path=settings.FEEDBACK_COMPACT_PATH,
+            checkpoint_path=settings.FEEDBACK_CHECKPOINT_PATH,
+            segments_dir=settings.FEEDBACK_SEGMENTS_DIR,
+            retention_days=settings.FEEDBACK_RETENTION_DAYS,
+            rotate=settings.FEEDBACK_ROTATE,
+            max_parts=settings.FEEDBACK_MAX_PARTS,
+        )
+        # Escritura diferida en lotes (write-behind); el total incluye lo ya rotado
+        self.feedback_buffer = FeedbackWriteBuffer(
+            self.feedback_store, archived=self.feedback_compactor.archived_count
+        )
+        # 🕶️ Modelo candidato evaluado en sombra antes de promoverlo
+        self.shadow = ShadowEvaluator()
+        if settings.SHADOW_MODE:
+            self._restore_shadow_candidate()
 
     def train_model(self, request: TrainingRequest) -> Dict[str, Any]:
         """Entrena el modelo con instancias históricas"""
-        instances = request.instances
+        cleaned_instances = self._clean_instances(request.instances)
+
+        if request.per_template:
+            return self._train_per_template(cleaned_instances)
+
+        if settings.SHADOW_MODE and self.engine.trained:
+            return self._train_shadow_candidate(cleaned_instances)
+
+        # Entrenar con datos limpios
+        metrics = self.engine.train(cleaned_instances)
+        self.executor.reload()
+
+        return {
+            'status': 'success',
+            'message': f"Modelo entrenado exitosamente con {len(cleaned_instances)} instancias",
+            'metrics': metrics
+        }
+
+    def _train_shadow_candidate(self, instances: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Entrena un modelo candidato sin activarlo; queda evaluándose en sombra"""
+        # Fijar el activo actual antes de que el candidato pase a ser el más reciente
+        if self.engine.active_timestamp() is None:
+            self.engine.set_active()
+
+        candidate = RecommendationEngine(model_path='./models', autoload=False)
+        metrics = candidate.train(instances, activate=False)
+
+        if candidate.model_timestamp == self.engine.model_timestamp:
+            return {
+                'status': 'success',
+                'message': "Los datos coinciden con el modelo activo: no hay candidato nuevo",
+                'metrics': metrics
+            }
+
+        self.shadow.set_candidate(candidate, metrics)
+        return {
+            'status': 'success',
+            'message': (
+                f"Modelo candidato entrenado con {len(instances)} instancias; "
+                f"en evaluación en sombra ({self.shadow.sample_rate:.0%} del tráfico)"
+            ),
+            'shadow': True,
+            'metrics': metrics
+        }
+
+    def _restore_shadow_candidate(self):
+        """Al reiniciar, retoma como candidato el modelo más reciente si no es el activo"""
+        latest = self.engine.latest_timestamp()
+        if latest is None or latest == self.engine.model_timestamp:
+            return
+        candidate = RecommendationEngine(model_path='./models', autoload=False)
+        if candidate.load_model(latest):
+            self.shadow.set_candidate(candidate)
+
+    def promote_shadow(self, force: bool = False) -> Dict[str, Any]:
+        """Promueve el candidato a modelo activo si pasa los umbrales (o si force=True)"""
+        candidate = self.shadow.candidate
+        if candidate is None:
+            raise ValueError("❌ No hay modelo candidato en evaluación")
+
+        gate = self.shadow.gate()
+        if not gate['passed'] and not force:
+            return {
+                'status': 'rejected',
+                'message': "El candidato no cumple los umbrales de promoción",
+                'gate': gate
+            }
+
+        previous = self.engine.model_timestamp
+        if not self.engine.load_model(candidate.model_timestamp):
+            raise ValueError(f"❌ No se pudo cargar el candidato {candidate.model_timestamp}")
+        self.engine.set_active()
+        self.executor.reload()
+        self.shadow.clear()
+        print(f"🚀 Modelo promovido: {previous} → {self.engine.model_timestamp}")
+
+        return {
+            'status': 'success',
+            'message': f"Modelo {self.engine.model_timestamp} promovido a activo",
+            'previous': previous,
+            'forced': force and not gate['passed'],
+            'gate': gate
+        }
+
+    def discard_shadow(self) -> Dict[str, Any]:
+        """Descarta el candidato actual y sus archivos; el modelo activo no cambia"""
+        candidate = self.shadow.candidate
+        self.shadow.clear()
+        if candidate is not None:
+            candidate.delete_model(candidate.model_timestamp)
+        return {
+            'status': 'success',
+            'discarded': candidate.model_timestamp if candidate else None,
+        }
 
+    def _train_per_template(self, instances: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Entrena en paralelo un modelo por templateId sin tocar los de otras plantillas"""
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for inst in instances:
+            template_id = normalize_template_id(inst.get("templateId"))
+            if template_id is None:
+                continue
+            groups.setdefault(template_id, []).append(inst)
+
+        if not groups:
+            raise ValueError("❌ Ninguna instancia tiene templateId para entrenar por plantilla")
+
+        print(f"🧩 Entrenando {len(groups)} modelos por plantilla...")
+        metrics = self.model_pool.train_templates(groups, workers=settings.MODEL_POOL_TRAIN_WORKERS)
+        self.executor.reload()
+
+        trained = [tid for tid, m in metrics.items() if 'error' not in m]
+        return {
+            'status': 'success' if trained else 'error',
+            'message': f"{len(trained)} de {len(groups)} plantillas entrenadas",
+            'templates_trained': trained,
+            'metrics': metrics
+        }
+
+    def _clean_instances(self, instances: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Normaliza comentarios y campos numéricos antes de entrenar"""
         print("======== [ML TRAIN] Limpiando datos antes del entrenamiento ========")
 
         cleaned_instances = []
@@ -70,81 +226,68 @@ class MLService:
             cleaned_instances.append(inst_copy)
 
         print(f"✅ Datos limpios: {len(cleaned_instances)} instancias listas para entrenamiento")
-
-        # Entrenar con datos limpios
-        metrics = self.engine.train(cleaned_instances)
-
-        return {
-            'status': 'success',
-            'message': f"Modelo entrenado exitosamente con {len(cleaned_instances)} instancias",
-            'metrics': metrics
-        }
+        return cleaned_instances
 
     def retrain_with_feedback(
         self, 
         historical_instances: List[Dict], 
-        feedback_file: str = None
+        feedback_file: str = None,
+        since: Optional[str] = None
     ) -> Dict[str, Any]:
         """Re-entrena el modelo incorporando feedback de usuarios"""
         
-        if feedback_file is None:
-            feedback_file = str(self.feedback_file)
-        
-        # Cargar feedbacks existentes
-        feedbacks = []
-        feedback_path = Path(feedback_file)
-        
-        if feedback_path.exists():
-            print(f"📂 Cargando feedbacks desde: {feedback_file}")
-            with open(feedback_path, "r", encoding="utf-8") as f:
-                for line_num, line in enumerate(f, 1):
-                    try:
-                        feedback = json.loads(line.strip())
-                        feedbacks.append(feedback)
-                    except json.JSONDecodeError as e:
-                        print(f"⚠️ Error en línea {line_num}: {e}")
-                        continue
+        if feedback_file:
+            # Un archivo explícito se lee completo con el backend JSONL
+            store = JSONLFeedbackStore(feedback_file)
+            source = store.location
+            print(f"📂 Cargando feedbacks desde: {source}")
+            total_feedbacks = store.count()
+            # Solo feedbacks de recomendaciones ML exitosas (filtrado en el backend)
+            feedbacks = store.query(fue_recomendacion_ml=True, score_above=0.5, since=since)
         else:
-            print(f"⚠️ Archivo de feedback no encontrado: {feedback_file}")
+            # Compactar lo nuevo y leer solo las columnas listas para entrenar
+            compaction = self.compact_feedback()
+            source = str(self.feedback_compactor.parts_dir)
+            print(f"📂 Cargando feedbacks compactados desde: {source}")
+            total_feedbacks = compaction['checkpoint']['consumed']
+            feedbacks = self.feedback_compactor.training_feedback(since=since)
         
-        print(f"📊 Re-entrenando con {len(historical_instances)} instancias históricas + {len(feedbacks)} feedbacks")
+        print(f"📊 Re-entrenando con {len(historical_instances)} instancias históricas + {len(feedbacks)} feedbacks útiles (de {total_feedbacks})")
         
         # Crear instancias sintéticas a partir de feedbacks positivos
         synthetic_instances_added = 0
         for fb in feedbacks:
-            # Solo usar feedbacks de recomendaciones ML exitosas
-            if fb.get("fue_recomendacion_ml") and fb.get("feedback_score", 0) > 0.5:
-                try:
-                    # Crear instancia sintética con la acción exitosa
-                    synthetic_instance = {
-                        "sections": [{
-                            "questions": [{
-                                "questionText": fb.get("question_text", ""),
-                                "response": fb.get("current_response", 0),
-                                "comment": fb.get("comment", "sin comentario"),
-                                "points": fb.get("feedback_score", 1.0) * 3,  # Escalar score a puntos
-                                # Incluir contexto adicional
-                                "accion_aplicada": fb.get("accion_seleccionada", ""),
-                                "context": fb.get("context", {}),
-                            }]
-                        }],
-                        # Campos adicionales de la instancia
-                        "totalObtainedPoints": fb.get("feedback_score", 1.0) * 3,
-                        "totalApplicablePoints": 3.0,
-                        "totalMaxPoints": 3.0,
-                        "overallCompliancePercentage": fb.get("feedback_score", 1.0) * 100,
-                        # Metadata
-                        "_synthetic": True,
-                        "_feedback_type": fb.get("feedback_type", "guardado"),
-                        "_timestamp": fb.get("timestamp", ""),
-                    }
-                    
-                    historical_instances.append(synthetic_instance)
-                    synthetic_instances_added += 1
-                    
-                except Exception as e:
-                    print(f"⚠️ Error procesando feedback: {e}")
-                    continue
+            try:
+                # Crear instancia sintética con la acción exitosa
+                synthetic_instance = {
+                    "sections": [{
+                        "questions": [{
+                            "questionText": fb.get("question_text", ""),
+                            "response": fb.get("current_response", 0),
+                            "comment": fb.get("comment", "sin comentario"),
+                            "points": fb.get("feedback_score", 1.0) * 3,  # Escalar score a puntos
+                            # Incluir contexto adicional
+                            "accion_aplicada": fb.get("accion_seleccionada", ""),
+                            "context": fb.get("context", {}),
+                        }]
+                    }],
+                    # Campos adicionales de la instancia
+                    "totalObtainedPoints": fb.get("feedback_score", 1.0) * 3,
+                    "totalApplicablePoints": 3.0,
+                    "totalMaxPoints": 3.0,
+                    "overallCompliancePercentage": fb.get("feedback_score", 1.0) * 100,
+                    # Metadata
+                    "_synthetic": True,
+                    "_feedback_type": fb.get("feedback_type", "guardado"),
+                    "_timestamp": fb.get("timestamp", ""),
+                }
+                
+                historical_instances.append(synthetic_instance)
+                synthetic_instances_added += 1
+                
+            except Exception as e:
+                print(f"⚠️ Error procesando feedback: {e}")
+                continue
         
         print(f"✅ Se agregaron {synthetic_instances_added} instancias sintéticas desde feedback")
         
@@ -154,13 +297,44 @@ class MLService:
         
         # Agregar información sobre el feedback usado
         result['feedback_stats'] = {
-            'total_feedbacks': len(feedbacks),
+            'total_feedbacks': total_feedbacks,
             'synthetic_instances_added': synthetic_instances_added,
-            'feedback_file': feedback_file,
+            'feedback_file': source,
         }
         
         return result
 
+    def compact_feedback(self) -> Dict[str, Any]:
+        """Vacía el buffer y compacta el feedback nuevo (dedup + filtro + rotación)"""
+        self.feedback_buffer.flush_now()
+        result = self.feedback_compactor.run()
+        if result['rotated_bytes'] or result['expired_rows']:
+            # Lo rotado/expirado sale del store: el total no cambia, pero se recalcula
+            # desde la fuente (ya estamos en un thread del pool bloqueante)
+            self.feedback_buffer.recount()
+        return result
+
+    def feedback_history(self, limit: Optional[int] = None, **filters) -> Dict[str, Any]:
+        """
+        Historial de feedback filtrado en el backend (índices en SQLite).
+        Cubre lo que sigue en el store activo: en JSONL lo ya rotado queda fuera,
+        en SQLite todo lo que no expiró por FEEDBACK_RETENTION_DAYS.
+        """
+        self.feedback_buffer.flush_now()
+        return {
+            'total': self.feedback_store.count(**filters),
+            'feedbacks': self.feedback_store.query(limit=limit, **filters),
+        }
+
+    def feedback_stats(self, group_by: str = "feedback_type", **filters) -> Dict[str, Any]:
+        """Cantidad y score promedio del feedback agrupados por una columna"""
+        self.feedback_buffer.flush_now()
+        return {
+            'group_by': group_by,
+            'total': self.feedback_store.count(**filters),
+            'groups': self.feedback_store.aggregate(group_by, **filters),
+        }
+
     def save_feedback(self, feedback_data: Dict[str, Any]) -> Dict[str, Any]:
         """Guarda feedback de usuario para futuro re-entrenamiento"""
         try:
@@ -168,17 +342,14 @@ class MLService:
             if 'timestamp' not in feedback_data:
                 feedback_data['timestamp'] = datetime.now().isoformat()
             
-            # Guardar en archivo JSONL (append)
-            with open(self.feedback_file, 'a', encoding='utf-8') as f:
-                json.dump(feedback_data, f, ensure_ascii=False)
-                f.write('\n')
+            self.feedback_buffer.enqueue(feedback_data)
             
-            print(f"✅ Feedback guardado: {self.feedback_file}")
+            print(f"✅ Feedback encolado para {self.feedback_store.location}")
             
             return {
                 'status': 'success',
                 'message': 'Feedback guardado exitosamente',
-                'file': str(self.feedback_file),
+                'file': self.feedback_store.location,
             }
             
         except Exception as e:
@@ -190,7 +361,8 @@ class MLService:
 
     def get_recommendation(self, request: RecommendationRequest) -> Dict[str, Any]:
         """Obtiene recomendación"""
-        recommendation = self.engine.predict(
+        engine = self.model_pool.get(self._template_id(request))
+        recommendation = engine.predict(
             question_text=request.question_text,
             current_response=request.current_response,
             comment=request.comment,
@@ -201,13 +373,34 @@ class MLService:
             'recommendation': recommendation
         }
 
+    async def get_recommendation_async(self, request: RecommendationRequest) -> Recommendation:
+        """Obtiene recomendación a través del executor de inferencia (no bloquea el event loop)"""
+        item = {
+            'question_text': request.question_text,
+            'current_response': request.current_response,
+            'comment': request.comment,
+            'context': request.context,
+            'template_id': self._template_id(request),
+        }
+        recommendation = await self.executor.submit(item)
+        # La sombra cubre solo el modelo global y corre después de tener la respuesta
+        if self.shadow.candidate is not None and (
+            item['template_id'] is None or not self.model_pool.has_model(item['template_id'])
+        ):
+            self.shadow.observe(self.engine, item)
+        return recommendation
+
+    @staticmethod
+    def _template_id(request: RecommendationRequest) -> Optional[str]:
+        """templateId explícito o, si no viene, el del contexto"""
+        if request.template_id is not None:
+            return normalize_template_id(request.template_id)
+        return normalize_template_id((request.context or {}).get('templateId'))
+
     def check_health(self) -> Dict[str, Any]:
         """Verifica estado del servicio"""
         # Contar feedbacks disponibles
-        feedback_count = 0
-        if self.feedback_file.exists():
-            with open(self.feedback_file, 'r', encoding='utf-8') as f:
-                feedback_count = sum(1 for _ in f)
+        feedback_count = self.feedback_buffer.total_count()
         
         # 🔥 NUEVO: Obtener info del modelo actual
         model_info = None
@@ -217,8 +410,9 @@ class MLService:
                 classifier_files = sorted(model_dir.glob('classifier_*.pkl'), reverse=True)
                 
                 if classifier_files:
-                    latest = classifier_files[0]
-                    timestamp = latest.stem.replace('classifier_', '')
+                    # El activo, que con evaluación en sombra no siempre es el más reciente
+                    timestamp = self.engine.model_timestamp or classifier_files[0].stem.replace('classifier_', '')
+                    latest = model_dir / f'classifier_{timestamp}.pkl'
                     
                     model_info = {
                         'filename': latest.name,
@@ -234,8 +428,32 @@ class MLService:
             'trained': self.engine.trained,
             'model_info': model_info,  # 🔥 NUEVO
             'feedback_count': feedback_count,
-            'feedback_file': str(self.feedback_file),
+            'feedback_file': self.feedback_store.location,
+            'feedback_buffer': self.feedback_buffer.stats(),
+            'inference': self.executor.stats(),
+            'model_pool': self.model_pool.stats(),
+            'shadow': {
+                'candidate': self.shadow.candidate.model_timestamp if self.shadow.candidate else None,
+                **self.shadow.gate(),
+            },
             'timestamp': datetime.now().isoformat()
         }
-# Instancia global
-ml_service = MLService()
\ No newline at end of file
+_ml_service: Optional[MLService] = None
+_ml_service_lock = threading.Lock()
+
+
+def get_ml_service() -> MLService:
+    """Instancia global, creada (y con modelos cargados) en el primer uso"""
+    global _ml_service
+    if _ml_service is None:
+        with _ml_service_lock:
+            if _ml_service is None:
+                _ml_service = MLService()
+    return _ml_service
+
+
+def __getattr__(name: str):
+    # Compatibilidad: `from app.services.ml_service import ml_service`
+    if name == "ml_service":
+        return get_ml_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
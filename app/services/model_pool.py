@@ -0,0 +1,185 @@
+# app/services/model_pool.py
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.models.model_bundle import ModelBundle
+from app.models.recommendation_engine import RecommendationEngine
+
+# Plantillas sin modelo recordadas (los templateId vienen del cliente: acotado)
+MISSING_CACHE_SIZE = 4096
+
+
+def normalize_template_id(template_id: Any) -> Optional[str]:
+    """Convierte el templateId de Mongo (str, {'$oid': ...}, ObjectId) a str"""
+    if template_id is None or template_id == "":
+        return None
+    if isinstance(template_id, dict):
+        template_id = template_id.get("$oid") or template_id.get("_id")
+        if template_id is None:
+            return None
+    return str(template_id)
+
+
+class ModelPool:
+    """
+    Pool de modelos especializados por plantilla de auditoría (templateId).
+
+    Los modelos se cargan de disco la primera vez que se usan y solo se
+    mantienen en memoria los max_resident más recientes (LRU). Si una
+    plantilla no tiene modelo propio se usa el modelo global, y se recuerda
+    que no lo tiene para no volver a buscarlo en disco en cada request
+    (hasta el próximo train_templates o invalidate()).
+    """
+
+    def __init__(self, base_path: str, fallback: RecommendationEngine, max_resident: int = 8):
+        self.base_path = Path(base_path) / "templates"
+        self.fallback = fallback
+        self.max_resident = max(1, max_resident)
+        self._resident: "OrderedDict[str, RecommendationEngine]" = OrderedDict()
+        self._missing: "OrderedDict[str, None]" = OrderedDict()
+        self._generation = 0  # Cambia en cada invalidate(): descarta búsquedas en curso
+        self._lock = threading.Lock()
+
+        # 📊 Métricas
+        self._hits = 0
+        self._loads = 0
+        self._evictions = 0
+        self._fallbacks = 0
+        self._missing_hits = 0
+
+    def template_path(self, template_id: str) -> Path:
+        safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", template_id)
+        return self.base_path / safe_id
+
+    def has_model(self, template_id: str) -> bool:
+        """Si la plantilla tiene modelo propio; el disco solo se consulta si no se sabe ya"""
+        with self._lock:
+            if template_id in self._resident:
+                return True
+            if template_id in self._missing:
+                self._missing.move_to_end(template_id)
+                self._missing_hits += 1
+                return False
+            generation = self._generation
+
+        path = self.template_path(template_id)
+        found = path.exists() and any(path.glob("classifier_*.pkl"))
+        if not found:
+            with self._lock:
+                if generation == self._generation:
+                    self._missing[template_id] = None
+                    while len(self._missing) > MISSING_CACHE_SIZE:
+                        self._missing.popitem(last=False)
+        return found
+
+    def invalidate(self):
+        """Olvida las plantillas sin modelo (se vuelven a buscar en disco)"""
+        with self._lock:
+            self._missing.clear()
+            self._generation += 1
+
+    def _put(self, template_id: str, engine: RecommendationEngine):
+        # Debe llamarse con self._lock tomado
+        self._resident[template_id] = engine
+        self._resident.move_to_end(template_id)
+        while len(self._resident) > self.max_resident:
+            evicted, _ = self._resident.popitem(last=False)
+            self._evictions += 1
+            print(f"♻️ Modelo de plantilla descargado de memoria (LRU): {evicted}")
+
+    def get(self, template_id: Optional[str]) -> RecommendationEngine:
+        """Modelo para la plantilla (carga perezosa) o el modelo global si no existe"""
+        if template_id is None:
+            return self.fallback
+
+        with self._lock:
+            engine = self._resident.get(template_id)
+            if engine is not None:
+                self._resident.move_to_end(template_id)
+                self._hits += 1
+                return engine
+
+        if not self.has_model(template_id):
+            self._fallbacks += 1
+            return self.fallback
+
+        engine = RecommendationEngine(model_path=str(self.template_path(template_id)))
+        if not engine.trained:
+            self._fallbacks += 1
+            return self.fallback
+
+        with self._lock:
+            self._loads += 1
+            self._put(template_id, engine)
+        return engine
+
+    def predict_batch(self, items: List[Dict[str, Any]], fallback_bundle: Optional[ModelBundle] = None) -> List[Any]:
+        """
+        Agrupa el lote por plantilla y resuelve cada grupo con su modelo.
+
+        fallback_bundle es el snapshot del modelo global que usa el executor;
+        sin él se toma el publicado en ese momento.
+        """
+        groups: Dict[Optional[str], List[int]] = {}
+        for index, item in enumerate(items):
+            groups.setdefault(item.get('template_id'), []).append(index)
+
+        results: List[Any] = [None] * len(items)
+        for template_id, indices in groups.items():
+            engine = self.get(template_id)
+            bundle = fallback_bundle if engine is self.fallback else None
+            predictions = engine.predict_batch([items[i] for i in indices], bundle)
+            for index, prediction in zip(indices, predictions):
+                results[index] = prediction
+        return results
+
+    def train_templates(
+        self, instances_by_template: Dict[str, List[Dict[str, Any]]], workers: int = 2
+    ) -> Dict[str, Dict[str, Any]]:
+        """Entrena un modelo por plantilla en paralelo; cada uno en su propio directorio"""
+
+        self.invalidate()
+
+        def train_one(template_id: str, instances: List[Dict[str, Any]]) -> Dict[str, Any]:
+            engine = RecommendationEngine(
+                model_path=str(self.template_path(template_id)), autoload=False
+            )
+            metrics = engine.train(instances)
+            with self._lock:
+                self._missing.pop(template_id, None)
+                self._generation += 1
+                self._put(template_id, engine)
+            return metrics
+
+        results: Dict[str, Dict[str, Any]] = {}
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ml-train") as pool:
+            futures = {
+                template_id: pool.submit(train_one, template_id, instances)
+                for template_id, instances in instances_by_template.items()
+            }
+            for template_id, future in futures.items():
+                try:
+                    results[template_id] = future.result()
+                except ValueError as e:
+                    # Datos insuficientes para esta plantilla: las demás siguen
+                    print(f"⚠️ Plantilla {template_id} no entrenada: {e}")
+                    results[template_id] = {'error': str(e)}
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            resident = list(self._resident.keys())
+        return {
+            'max_resident': self.max_resident,
+            'resident': resident,
+            'hits': self._hits,
+            'loads': self._loads,
+            'evictions': self._evictions,
+            'fallbacks': self._fallbacks,
+            'known_missing': len(self._missing),
+            'missing_hits': self._missing_hits,
+        }
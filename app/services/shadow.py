@@ -0,0 +1,192 @@
+# app/services/shadow.py
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.recommendation_engine import RecommendationEngine
+
+
+class ShadowEvaluator:
+    """
+    Evaluación en sombra de un modelo candidato sobre tráfico real.
+
+    Una fracción configurable de los requests de /recommend se vuelve a
+    evaluar, después de responder al usuario, con el modelo activo y con el
+    candidato en un pool propio. Se registran la tasa de acuerdo y las
+    latencias de ambos; la promoción del candidato queda condicionada a esos
+    números.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = settings.SHADOW_SAMPLE_RATE,
+        min_samples: int = settings.SHADOW_MIN_SAMPLES,
+        min_agreement: float = settings.SHADOW_MIN_AGREEMENT,
+        max_latency_ratio: float = settings.SHADOW_MAX_LATENCY_RATIO,
+        max_pending: int = settings.SHADOW_MAX_PENDING,
+    ):
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.min_samples = min_samples
+        self.min_agreement = min_agreement
+        self.max_latency_ratio = max_latency_ratio
+        self.max_pending = max_pending
+
+        self.candidate: Optional[RecommendationEngine] = None
+        self.candidate_metrics: Optional[Dict[str, Any]] = None
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ml-shadow")
+        self._lock = threading.Lock()
+        self._tasks = set()
+        self._pending = 0
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._samples = 0
+        self._agreements = 0
+        self._dropped = 0
+        self._errors = 0
+        self._active_latencies: deque = deque(maxlen=5000)
+        self._candidate_latencies: deque = deque(maxlen=5000)
+        self._disagreements: deque = deque(maxlen=50)
+        self._started_at = datetime.now().isoformat()
+
+    # ------------------------------------------------------------------
+    # Candidato
+    # ------------------------------------------------------------------
+    def set_candidate(self, candidate: RecommendationEngine, metrics: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self.candidate = candidate
+            self.candidate_metrics = metrics
+            self._reset_stats()
+        print(f"🕶️ Modelo candidato en sombra: {candidate.model_timestamp} (muestreo {self.sample_rate:.0%})")
+
+    def clear(self):
+        with self._lock:
+            self.candidate = None
+            self.candidate_metrics = None
+            self._reset_stats()
+
+    # ------------------------------------------------------------------
+    # Tráfico
+    # ------------------------------------------------------------------
+    def observe(self, active: RecommendationEngine, item: Dict[str, Any]):
+        """Programa (si toca en el muestreo) la evaluación en sombra. No bloquea"""
+        candidate = self.candidate
+        if candidate is None or self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._dropped += 1
+                return
+            self._pending += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._pool, self._evaluate, active, candidate, item)
+        task = asyncio.ensure_future(future)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _evaluate(self, active: RecommendationEngine, candidate: RecommendationEngine, item: Dict[str, Any]):
+        try:
+            started = time.perf_counter()
+            active_result = active.predict_batch([item])[0]
+            active_latency = time.perf_counter() - started
+
+            started = time.perf_counter()
+            candidate_result = candidate.predict_batch([item])[0]
+            candidate_latency = time.perf_counter() - started
+
+            active_score = active_result.template.predicted_optimal_score
+            candidate_score = candidate_result.template.predicted_optimal_score
+            with self._lock:
+                if candidate is not self.candidate:
+                    return  # El candidato cambió mientras tanto
+                self._samples += 1
+                self._active_latencies.append(active_latency)
+                self._candidate_latencies.append(candidate_latency)
+                if active_score == candidate_score:
+                    self._agreements += 1
+                else:
+                    self._disagreements.append({
+                        'question_text': item.get('question_text'),
+                        'current_response': item.get('current_response'),
+                        'active': active_score,
+                        'candidate': candidate_score,
+                        'candidate_confidence': candidate_result.confidence,
+                    })
+        except Exception as e:
+            with self._lock:
+                if candidate is self.candidate:  # No contar errores del candidato anterior
+                    self._errors += 1
+            print(f"⚠️ Error en evaluación en sombra: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    # ------------------------------------------------------------------
+    # Métricas y promoción
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _percentiles_ms(latencies: List[float]) -> Dict[str, float]:
+        if not latencies:
+            return {'p50': 0.0, 'p95': 0.0}
+        values = np.array(latencies) * 1000
+        return {
+            'p50': round(float(np.percentile(values, 50)), 4),
+            'p95': round(float(np.percentile(values, 95)), 4),
+        }
+
+    def gate(self) -> Dict[str, Any]:
+        """Evalúa si el candidato cumple los umbrales de promoción"""
+        with self._lock:
+            samples = self._samples
+            agreement = self._agreements / samples if samples else 0.0
+            active_latency = self._percentiles_ms(list(self._active_latencies))
+            candidate_latency = self._percentiles_ms(list(self._candidate_latencies))
+
+        latency_ratio = (
+            candidate_latency['p95'] / active_latency['p95'] if active_latency['p95'] > 0 else 0.0
+        )
+        reasons = []
+        if samples < self.min_samples:
+            reasons.append(f"muestras insuficientes ({samples}/{self.min_samples})")
+        if agreement < self.min_agreement:
+            reasons.append(f"acuerdo {agreement:.2%} < {self.min_agreement:.2%}")
+        if latency_ratio > self.max_latency_ratio:
+            reasons.append(f"latencia p95 x{latency_ratio:.2f} > x{self.max_latency_ratio:.2f}")
+
+        return {
+            'passed': self.candidate is not None and not reasons,
+            'reasons': reasons if self.candidate is not None else ["no hay modelo candidato"],
+            'samples': samples,
+            'agreement_rate': round(agreement, 4),
+            'latency_ratio_p95': round(latency_ratio, 4),
+            'active_latency_ms': active_latency,
+            'candidate_latency_ms': candidate_latency,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        candidate = self.candidate
+        return {
+            'enabled': settings.SHADOW_MODE,
+            'candidate': candidate.model_timestamp if candidate else None,
+            'candidate_metrics': self.candidate_metrics,
+            'sample_rate': self.sample_rate,
+            'since': self._started_at,
+            'pending': self._pending,
+            'dropped': self._dropped,
+            'errors': self._errors,
+            'thresholds': {
+                'min_samples': self.min_samples,
+                'min_agreement': self.min_agreement,
+                'max_latency_ratio': self.max_latency_ratio,
+            },
+            'gate': self.gate(),
+            'recent_disagreements': list(self._disagreements),
+        }
@@ -0,0 +1,110 @@
+"""
+Benchmark de parseo de body JSON en endpoints ML.
+
+Compara el camino anterior (request.body() + request.json() + modelo Pydantic
+construido a mano) contra el actual (orjson, una sola decodificación,
+model_validate y ORJSONResponse). Reporta requests por segundo.
+
+Requiere las dependencias de desarrollo (httpx):
+    pip install -r requirements-dev.txt
+
+Uso:
+    python scripts/bench_json_body.py --instances 500 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
+
+from app.api.json_body import parse_json_model
+from app.schemas.recommendation import TrainingRequest
+
+
+def build_payload(n_instances: int) -> bytes:
+    rnd = random.Random(42)
+    instances = []
+    for i in range(n_instances):
+        sections = []
+        for s in range(4):
+            questions = [
+                {
+                    "questionText": f"Pregunta {q} de la sección {s}",
+                    "response": rnd.choice([0, 1, 2, 3, "N/A"]),
+                    "points": 3,
+                    "comment": rnd.choice(["", "sin observaciones", "falta señalización"]),
+                }
+                for q in range(10)
+            ]
+            sections.append({
+                "sectionId": f"s{s}",
+                "questions": questions,
+                "compliancePercentage": rnd.uniform(0, 100),
+            })
+        instances.append({
+            "sections": sections,
+            "templateId": "bench",
+            "overallCompliancePercentage": rnd.uniform(0, 100),
+            "status": "completed",
+        })
+    return json.dumps({"instances": instances}).encode()
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/legacy")
+    async def legacy(request: Request):
+        _ = f"Headers: {dict(request.headers)}"  # costo del volcado de headers
+        raw_body = await request.body()
+        json_body = await request.json()
+        payload = TrainingRequest(**json_body)
+        return {"received": len(payload.instances), "bytes": len(raw_body)}
+
+    @app.post("/fast", response_class=ORJSONResponse)
+    async def fast(request: Request):
+        payload = await parse_json_model(request, TrainingRequest, 512 * 1024 * 1024)
+        return ORJSONResponse({"received": len(payload.instances)})
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, body: bytes, n_requests: int) -> float:
+    headers = {"content-type": "application/json"}
+    await client.post(path, content=body, headers=headers)  # calentamiento
+    start = time.perf_counter()
+    for _ in range(n_requests):
+        response = await client.post(path, content=body, headers=headers)
+        response.raise_for_status()
+    return n_requests / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instances", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=100)
+    args = parser.parse_args()
+
+    body = build_payload(args.instances)
+    app = build_app()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        legacy_rps = await measure(client, "/legacy", body, args.requests)
+        fast_rps = await measure(client, "/fast", body, args.requests)
+
+    print(f"Payload: {len(body) / 1024:.1f} KB ({args.instances} instancias)")
+    print(f"Legacy (body + json + Pydantic): {legacy_rps:8.1f} req/s")
+    print(f"orjson + model_validate:        {fast_rps:8.1f} req/s")
+    print(f"Mejora: x{fast_rps / legacy_rps:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Benchmark de arranque de la aplicación por subconjunto de componentes.
+
+Para cada valor de APP_COMPONENTS lanza procesos nuevos que importan
+app.main y ejecutan el startup del lifespan. Reporta el tiempo de import,
+el tiempo hasta quedar listo, la memoria residente máxima y qué
+dependencias pesadas quedaron cargadas.
+
+Uso:
+    python scripts/bench_startup.py --components converter ml all --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = ("numpy", "pandas", "sklearn", "joblib", "scipy")
+
+CHILD = """
+import time
+started = time.perf_counter()
+import asyncio, json, resource, sys, warnings
+warnings.filterwarnings("ignore")
+
+from app.main import app
+imported = time.perf_counter()
+
+async def boot():
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+
+ready = asyncio.run(boot())
+print("__BENCH__" + json.dumps({
+    "import_s": imported - started,
+    "ready_s": ready - started,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_once(components: str) -> dict:
+    env = dict(os.environ, APP_COMPONENTS=components, PYTHONPATH=str(ROOT))
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith("__BENCH__"):
+            return json.loads(line[len("__BENCH__"):])
+    raise RuntimeError(f"Falló el arranque con APP_COMPONENTS={components}:\n{result.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--components", nargs="+", default=["converter", "ml", "all"])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'componentes':<12} {'import (ms)':>12} {'listo (ms)':>12} {'RSS (MB)':>10}  dependencias pesadas")
+    for components in args.components:
+        samples = [run_once(components) for _ in range(args.runs)]
+        import_ms = statistics.median(s["import_s"] for s in samples) * 1000
+        ready_ms = statistics.median(s["ready_s"] for s in samples) * 1000
+        rss = statistics.median(s["max_rss_mb"] for s in samples)
+        heavy = ", ".join(samples[-1]["heavy"]) or "-"
+        print(f"{components:<12} {import_ms:>12.1f} {ready_ms:>12.1f} {rss:>10.1f}  {heavy}")
+
+
+if __name__ == "__main__":
+    main()
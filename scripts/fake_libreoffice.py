@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Reemplazo local de `libreoffice` para pruebas de carga del conversor.
+
+Acepta los mismos argumentos que usa app/services/conversion_jobs.py y
+escribe un PDF sintético en --outdir después de una demora configurable:
+
+    FAKE_LIBREOFFICE_DELAY_S   demora base por conversión (default 1.0)
+    FAKE_LIBREOFFICE_JITTER_S  variación aleatoria uniforme ± (default 0.0)
+    FAKE_LIBREOFFICE_PDF_KB    tamaño del PDF generado (default 200)
+    FAKE_LIBREOFFICE_FAIL_RATE fracción de conversiones que fallan (default 0.0)
+
+Uso:
+    LIBREOFFICE_BIN=scripts/fake_libreoffice.py uvicorn app.main:app
+"""
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+
+def main(args):
+    if "--version" in args:
+        print("LibreOffice 7.6.0.0 (fake_libreoffice.py)")
+        return 0
+
+    delay = float(os.environ.get("FAKE_LIBREOFFICE_DELAY_S", "1.0"))
+    jitter = float(os.environ.get("FAKE_LIBREOFFICE_JITTER_S", "0.0"))
+    pdf_kb = int(os.environ.get("FAKE_LIBREOFFICE_PDF_KB", "200"))
+    fail_rate = float(os.environ.get("FAKE_LIBREOFFICE_FAIL_RATE", "0.0"))
+
+    try:
+        outdir = Path(args[args.index("--outdir") + 1])
+        export_filter = args[args.index("--convert-to") + 1]
+        source = Path(args[-1])
+    except (ValueError, IndexError):
+        print("uso: fake_libreoffice.py --convert-to <filtro> --outdir <dir> <archivo>", file=sys.stderr)
+        return 2
+
+    time.sleep(max(0.0, delay + random.uniform(-jitter, jitter)))
+
+    if random.random() < fail_rate:
+        print(f"Error: source file could not be loaded ({source.name})", file=sys.stderr)
+        return 1
+
+    header = f"%PDF-1.4\n% fake_libreoffice: {source.name} {export_filter}\n".encode()
+    (outdir / f"{source.stem}.pdf").write_bytes(header + os.urandom(max(0, pdf_kb * 1024 - len(header))))
+    print(f"convert {source} -> {outdir / (source.stem + '.pdf')} using filter : {export_filter}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,36 @@
+"""
+Importa el feedback existente en JSONL a la base SQLite.
+
+Uso:
+    python scripts/import_feedback.py --source data/feedback.jsonl --db data/feedback.db
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.feedback_store import SQLiteFeedbackStore, import_jsonl
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default="./data/feedback.jsonl")
+    parser.add_argument("--db", default="./data/feedback.db")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if not Path(args.source).exists():
+        print(f"❌ No existe el archivo de origen: {args.source}")
+        sys.exit(1)
+
+    store = SQLiteFeedbackStore(args.db)
+    before = store.count()
+    imported = import_jsonl(store, args.source, batch_size=args.batch_size)
+    print(f"✅ Importados {imported} feedbacks a {args.db} (antes: {before}, ahora: {store.count()})")
+    print("   Active FEEDBACK_BACKEND=sqlite para usar la base importada")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
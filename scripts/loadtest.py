@@ -0,0 +1,447 @@
+"""
+Prueba de carga del servicio con una mezcla de tráfico de auditorías sintéticas.
+
+Levanta la app (uvicorn) en un directorio temporal con una copia de los
+modelos y con scripts/fake_libreoffice.py en lugar de LibreOffice, y la
+carga con N clientes concurrentes durante un tiempo fijo. La mezcla de
+rutas es configurable:
+
+    recommend  POST /api/ml/recommend/
+    feedback   ráfaga de --feedback-burst POST /api/ml/feedback/
+    train      POST /api/ml/train/ (uno a la vez, como en producción)
+    convert    POST /api/ml/converter/jobs + polling + descarga del PDF
+
+Reporta throughput y latencias p50/p95/p99 por ruta y el lag del event
+loop del servidor (medido dentro del proceso servidor).
+
+Requiere las dependencias de desarrollo (httpx):
+    pip install -r requirements-dev.txt
+
+Uso:
+    python scripts/loadtest.py --duration 30 --concurrency 32 \\
+        --mix recommend=90,feedback=6,convert=3,train=1 --converter-delay 2
+    python scripts/loadtest.py --url http://localhost:8000   # servidor ya levantado (sin lag)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+ROUTES = ("recommend", "feedback", "train", "convert")
+LAG_PATH = "/__loadtest/lag"
+
+QUESTIONS = [
+    "Extintores señalizados, accesibles y con carga vigente",
+    "Orden y limpieza del área de trabajo",
+    "Uso de EPP completo por parte del personal",
+    "Rutas de evacuación libres y señalizadas",
+    "Botiquín de primeros auxilios abastecido",
+    "Tableros eléctricos cerrados y rotulados",
+    "Almacenamiento de sustancias químicas con hojas de seguridad",
+    "Andamios inspeccionados y con tarjeta de habilitación",
+]
+COMMENTS = ["", "sin observaciones", "falta señalización", "vencido", "parcialmente cumplido"]
+ACTIONS = [
+    "Capacitar al personal",
+    "Reponer señalética",
+    "Programar inspección semanal",
+    "Asignar responsable de seguimiento",
+]
+TEMPLATES = ["tpl-almacen", "tpl-obra", "tpl-oficina"]
+
+
+# ----------------------------------------------------------------------
+# Tráfico sintético
+# ----------------------------------------------------------------------
+def recommend_payload(rnd: random.Random) -> Dict[str, Any]:
+    return {
+        "question_text": rnd.choice(QUESTIONS),
+        "current_response": rnd.randint(0, 3),
+        "comment": rnd.choice(COMMENTS),
+        "context": {"templateId": rnd.choice(TEMPLATES)},
+    }
+
+
+def feedback_payload(rnd: random.Random) -> Dict[str, Any]:
+    return {
+        **recommend_payload(rnd),
+        "comment": rnd.choice(COMMENTS) or "sin comentario",
+        "accion_seleccionada": rnd.choice(ACTIONS),
+        "fue_recomendacion_ml": rnd.random() < 0.7,
+        "indice_recomendacion": rnd.randint(0, 3),
+        "feedback_type": rnd.choice(["guardado", "aprobado", "rechazado"]),
+        "feedback_score": rnd.choice([-1.0, 0.5, 1.0, 2.0]),
+    }
+
+
+def training_payload(rnd: random.Random, n_instances: int) -> Dict[str, Any]:
+    instances = []
+    for _ in range(n_instances):
+        sections = []
+        for s in range(3):
+            questions = [
+                {
+                    "questionText": question,
+                    "response": rnd.choice([0, 1, 2, 3, "N/A"]),
+                    "points": 3,
+                    "comment": rnd.choice(COMMENTS),
+                }
+                for question in rnd.sample(QUESTIONS, 4)
+            ]
+            sections.append({
+                "sectionId": f"s{s}",
+                "questions": questions,
+                "maxPoints": 12,
+                "obtainedPoints": 8,
+                "applicablePoints": 12,
+                "naCount": 0,
+                "compliancePercentage": rnd.uniform(20, 100),
+            })
+        instances.append({
+            "sections": sections,
+            "templateId": rnd.choice(TEMPLATES),
+            "overallCompliancePercentage": rnd.uniform(20, 100),
+            "totalObtainedPoints": 24,
+            "totalApplicablePoints": 36,
+            "status": "completed",
+        })
+    return {"instances": instances}
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ROUTES:
+            raise argparse.ArgumentTypeError(f"Ruta desconocida en --mix: {name} (opciones: {', '.join(ROUTES)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("--mix necesita al menos un peso > 0")
+    return mix
+
+
+# ----------------------------------------------------------------------
+# Métricas
+# ----------------------------------------------------------------------
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.statuses: Dict[str, int] = {}
+
+    def record(self, seconds: float, status: Any):
+        self.latencies.append(seconds)
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        if not (isinstance(status, int) and 200 <= status < 300):
+            self.errors += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        ms = [value * 1000 for value in self.latencies]
+        return {
+            "requests": len(ms),
+            "errors": self.errors,
+            "throughput_rps": round(len(ms) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(ms, 50), 2),
+            "p95_ms": round(percentile(ms, 95), 2),
+            "p99_ms": round(percentile(ms, 99), 2),
+            "max_ms": round(max(ms), 2) if ms else 0.0,
+            "statuses": self.statuses,
+        }
+
+
+# ----------------------------------------------------------------------
+# Servidor bajo prueba
+# ----------------------------------------------------------------------
+def serve(port: int, lag_interval_ms: float):
+    """Modo servidor: la app real + un monitor de lag del event loop"""
+    from contextlib import asynccontextmanager
+
+    import uvicorn
+    from fastapi import FastAPI
+
+    from app.main import create_app
+
+    app = create_app()
+    interval = lag_interval_ms / 1000
+    lags: deque = deque(maxlen=200_000)
+
+    async def monitor():
+        # perf_counter: loop.time() de uvloop tiene resolución de milisegundos
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(max(0.0, time.perf_counter() - started - interval))
+
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        async with app_lifespan(app):
+            task = asyncio.create_task(monitor())
+            yield
+            task.cancel()
+
+    app.router.lifespan_context = lifespan
+
+    @app.get(LAG_PATH, include_in_schema=False)
+    async def loop_lag(reset: bool = False):
+        values = [lag * 1000 for lag in lags]
+        if reset:
+            lags.clear()
+        return {
+            "samples": len(values),
+            "interval_ms": lag_interval_ms,
+            "p50_ms": round(percentile(values, 50), 3),
+            "p95_ms": round(percentile(values, 95), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+            "max_ms": round(max(values), 3) if values else 0.0,
+        }
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args) -> "tuple[subprocess.Popen, str, Path]":
+    """Levanta el servidor en un directorio temporal para no tocar models/ ni data/"""
+    workdir = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    (workdir / "models").mkdir()
+    for model_file in list((ROOT / "models").glob("*.pkl")) + list((ROOT / "models").glob("*.json")):
+        shutil.copy2(model_file, workdir / "models" / model_file.name)
+
+    port = _free_port()
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(ROOT),
+        LIBREOFFICE_BIN=args.libreoffice_bin,
+        FAKE_LIBREOFFICE_DELAY_S=str(args.converter_delay),
+        FAKE_LIBREOFFICE_JITTER_S=str(args.converter_jitter),
+        CONVERTER_TEMP_DIR=str(workdir / "excel-to-pdf"),
+        CONVERTER_JOBS_DIR=str(workdir / "jobs"),
+    )
+    log = open(workdir / "server.log", "w")
+    process = subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve()), "--serve", "--port", str(port),
+         "--lag-interval-ms", str(args.lag_interval_ms)],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"El servidor terminó al arrancar; ver {workdir / 'server.log'}")
+        try:
+            if httpx.get(url + "/", timeout=1).status_code == 200:
+                return process, url, workdir
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"El servidor no respondió en {args.startup_timeout}s; ver {workdir / 'server.log'}")
+
+
+# ----------------------------------------------------------------------
+# Generador de carga
+# ----------------------------------------------------------------------
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.stats: Dict[str, RouteStats] = {}
+        self.train_lock = asyncio.Lock()
+        self.excel = Path(args.excel).read_bytes() if args.excel else b"PK\x03\x04" + os.urandom(args.excel_kb * 1024)
+
+    def _stats(self, name: str) -> RouteStats:
+        return self.stats.setdefault(name, RouteStats())
+
+    async def _timed(self, name: str, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            self._stats(name).record(time.perf_counter() - started, type(e).__name__)
+            return None
+        self._stats(name).record(time.perf_counter() - started, response.status_code)
+        return response
+
+    async def recommend(self, rnd: random.Random):
+        await self._timed("recommend", "POST", "/api/ml/recommend/", json=recommend_payload(rnd))
+
+    async def feedback(self, rnd: random.Random):
+        await asyncio.gather(*(
+            self._timed("feedback", "POST", "/api/ml/feedback/", json=feedback_payload(rnd))
+            for _ in range(self.args.feedback_burst)
+        ))
+
+    async def train(self, rnd: random.Random):
+        if self.train_lock.locked():
+            return await self.recommend(rnd)  # Un entrenamiento a la vez
+        async with self.train_lock:
+            # Datos nuevos en cada llamada: si no, el modelo se reutiliza por fingerprint
+            payload = training_payload(rnd, self.args.train_instances)
+            await self._timed("train", "POST", "/api/ml/train/", json=payload)
+
+    async def convert(self, rnd: random.Random):
+        started = time.perf_counter()
+        response = await self._timed(
+            "convert.submit", "POST", "/api/ml/converter/jobs",
+            files={"file": ("auditoria.xlsx", self.excel)},
+            params={"quality": rnd.choice(["draft", "normal", "high"])},
+        )
+        if response is None or response.status_code != 202:
+            self._stats("convert.job").record(time.perf_counter() - started, "submit_failed")
+            return
+        job_id = response.json()["id"]
+
+        status = "queued"
+        while status in ("queued", "running"):
+            await asyncio.sleep(self.args.poll_interval)
+            poll = await self._timed("convert.status", "GET", f"/api/ml/converter/jobs/{job_id}")
+            if poll is None or poll.status_code != 200:
+                break
+            status = poll.json()["status"]
+
+        if status == "done":
+            download = await self._timed("convert.download", "GET", f"/api/ml/converter/jobs/{job_id}/download")
+            status = download.status_code if download is not None else "download_failed"
+            await self.client.delete(f"/api/ml/converter/jobs/{job_id}")
+        self._stats("convert.job").record(time.perf_counter() - started, 200 if status == 200 else status)
+
+    async def worker(self, index: int, deadline: float):
+        rnd = random.Random(self.args.seed + index)
+        routes = list(self.args.mix)
+        weights = [self.args.mix[route] for route in routes]
+        while time.monotonic() < deadline:
+            route = rnd.choices(routes, weights)[0]
+            await getattr(self, route)(rnd)
+            if self.args.think_ms:
+                await asyncio.sleep(rnd.expovariate(1000 / self.args.think_ms))
+
+
+async def run_load(args, url: str, measure_lag: bool) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=url, timeout=args.request_timeout, limits=limits) as client:
+        generator = LoadGenerator(client, args)
+
+        # Calentamiento: modelo cargado y conexiones abiertas
+        await client.post("/api/ml/recommend/", json=recommend_payload(random.Random(0)))
+        if measure_lag:
+            await client.get(LAG_PATH, params={"reset": True})
+
+        print(f"🔥 {args.concurrency} clientes durante {args.duration:g}s → {url}  mezcla={args.mix}")
+        started = time.monotonic()
+        deadline = started + args.duration
+        await asyncio.gather(*(generator.worker(i, deadline) for i in range(args.concurrency)))
+        elapsed = time.monotonic() - started
+
+        lag = (await client.get(LAG_PATH)).json() if measure_lag else None
+
+    return {
+        "duration_s": round(elapsed, 3),
+        "concurrency": args.concurrency,
+        "mix": args.mix,
+        "converter_delay_s": args.converter_delay,
+        "routes": {name: stats.summary(elapsed) for name, stats in sorted(generator.stats.items())},
+        "event_loop_lag": lag,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print()
+    print(f"{'ruta':<18} {'n':>7} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, route in report["routes"].items():
+        print(
+            f"{name:<18} {route['requests']:>7} {route['errors']:>5} {route['throughput_rps']:>9.1f} "
+            f"{route['p50_ms']:>9.1f} {route['p95_ms']:>9.1f} {route['p99_ms']:>9.1f} {route['max_ms']:>9.1f}"
+        )
+    lag = report["event_loop_lag"]
+    if lag:
+        print(
+            f"\nLag del event loop ({lag['samples']} muestras cada {lag['interval_ms']:g}ms): "
+            f"p50={lag['p50_ms']:.2f}ms p95={lag['p95_ms']:.2f}ms p99={lag['p99_ms']:.2f}ms max={lag['max_ms']:.2f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Servidor ya levantado (no se arranca uno local ni se mide el lag)")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("recommend=90,feedback=6,convert=3,train=1"))
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pausa media entre requests de un cliente")
+    parser.add_argument("--feedback-burst", type=int, default=5)
+    parser.add_argument("--train-instances", type=int, default=40)
+    parser.add_argument("--excel", help="Archivo Excel real a subir (por defecto bytes sintéticos)")
+    parser.add_argument("--excel-kb", type=int, default=64)
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--converter-delay", type=float, default=1.0, help="Demora del LibreOffice falso (s)")
+    parser.add_argument("--converter-jitter", type=float, default=0.2)
+    parser.add_argument("--libreoffice-bin", default=str(ROOT / "scripts" / "fake_libreoffice.py"))
+    parser.add_argument("--lag-interval-ms", type=float, default=10.0)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Guardar el reporte en este archivo")
+    parser.add_argument("--keep-workdir", action="store_true")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.port, args.lag_interval_ms)
+
+    process = workdir = None
+    url = args.url
+    if url is None:
+        process, url, workdir = start_server(args)
+        print(f"🚀 Servidor local en {url} (directorio {workdir})")
+    try:
+        report = asyncio.run(run_load(args, url, measure_lag=process is not None))
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            if not args.keep_workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Reporte guardado en {args.json}")
+
+
+if __name__ == "__main__":
+    main()